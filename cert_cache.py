@@ -0,0 +1,137 @@
+"""
+Persistent certificate store.
+
+Stores the SHA-256 fingerprint, expiry date and issuer of each host's
+certificate in a SQLite file, so they survive between runs and a run can
+report the certificates that were replaced since the previous one, and
+whether their issuer changed. A probe records each distinct certificate it
+receives once per run, so the store is not touched on every test. SQLite
+also keeps the file consistent when sharded worker processes share it.
+"""
+
+import hashlib
+import sqlite3
+import threading
+from collections import namedtuple
+from datetime import datetime
+
+CachedCertificate = namedtuple(
+    "CachedCertificate", ["fingerprint", "not_after", "issuer", "checked_at"]
+)
+
+
+def certificate_fingerprint(der):
+    """Return the SHA-256 fingerprint of a DER-encoded certificate."""
+    return hashlib.sha256(der).hexdigest()
+
+
+def certificate_issuer(cert):
+    """Return a readable issuer name from a certificate returned by getpeercert."""
+    fields = dict(item for rdn in cert.get("issuer", ()) for item in rdn)
+    return fields.get("organizationName") or fields.get("commonName") or "Unknown"
+
+
+class CertificateCache:
+    """Certificates by hostname, stored in a SQLite file."""
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): SQLite file to store the certificates in
+        """
+        self.path = path
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        """Pickle only the settings, so a cache can be sent to a worker."""
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _connect(self):
+        """Open the database on first use, creating the table if needed."""
+        if self._connection is None:
+            self._connection = sqlite3.connect(
+                self.path, timeout=30, check_same_thread=False
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS certificates ("
+                "hostname TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, "
+                "not_after TEXT NOT NULL, issuer TEXT, checked_at TEXT NOT NULL)"
+            )
+            self._connection.commit()
+        return self._connection
+
+    def get(self, hostname):
+        """
+        Get the cached certificate of a host.
+
+        Returns:
+            CachedCertificate: Cached entry, or None if the host is unknown
+        """
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT fingerprint, not_after, issuer, checked_at "
+                    "FROM certificates WHERE hostname = ?",
+                    (hostname,),
+                )
+                .fetchone()
+            )
+        if row is None:
+            return None
+
+        fingerprint, not_after, issuer, checked_at = row
+        return CachedCertificate(
+            fingerprint,
+            datetime.fromisoformat(not_after),
+            issuer,
+            datetime.fromisoformat(checked_at),
+        )
+
+    def put(self, hostname, fingerprint, not_after, issuer):
+        """Store the certificate of a host."""
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO certificates "
+                "(hostname, fingerprint, not_after, issuer, checked_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    hostname,
+                    fingerprint,
+                    not_after.isoformat(),
+                    issuer,
+                    datetime.now().isoformat(),
+                ),
+            )
+            connection.commit()
+
+    def record(self, hostname, fingerprint, not_after, issuer):
+        """
+        Store the certificate a host presented, noting if it was replaced.
+
+        Args:
+            hostname (str): Host the certificate was received from
+            fingerprint (str): SHA-256 fingerprint of the certificate
+            not_after (datetime): Expiry date of the certificate
+            issuer (str): Readable issuer name
+
+        Returns:
+            CachedCertificate: The certificate stored by an earlier run if it
+            was a different one, or None if the host is new or unchanged
+        """
+        cached = self.get(hostname)
+        if cached is not None and cached.fingerprint == fingerprint:
+            return None
+        self.put(hostname, fingerprint, not_after, issuer)
+        return cached
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -0,0 +1,221 @@
+"""
+Circuit breaker for domains that fail definitively.
+
+A test whose HTTP and HTTPS requests both fail because the name does not
+resolve (NXDOMAIN) or the connection is refused opens the domain's circuit:
+its remaining tests are skipped and its result records the reason. Timeouts
+open it once they happen in several tests in a row; requests cut short by
+the domain's budget or the run deadline do not count.
+
+With a ``BreakerStore``, an opened circuit also starts a cooldown kept in a
+SQLite file, so the domain is skipped by later runs until the cooldown ends.
+Each time the domain fails again after a cooldown, the next one doubles, up
+to a maximum. A successful test clears it.
+"""
+
+import socket
+import sqlite3
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from http_probe import DeadlineExceeded
+
+# Readable reasons of the definitive failures
+FAILURE_REASONS = {
+    "nxdomain": "DNS name does not exist (NXDOMAIN)",
+    "refused": "connection refused",
+    "timeout": "timed out",
+}
+
+# Tests in a row in which both protocols timed out before the circuit opens
+DEFAULT_TIMEOUT_TRIPS = 2
+
+DEFAULT_COOLDOWN_HOURS = 6
+DEFAULT_MAX_COOLDOWN_HOURS = 168
+
+# getaddrinfo errors meaning the name does not exist, rather than a lookup
+# that failed for now
+NXDOMAIN_ERRORS = {socket.EAI_NONAME, getattr(socket, "EAI_NODATA", socket.EAI_NONAME)}
+
+Cooldown = namedtuple("Cooldown", ["reason", "failures", "until"])
+
+
+def failure_kind(error):
+    """
+    Classify the exception of a failed request.
+
+    Returns:
+        str: "nxdomain", "refused" or "timeout", "deadline" for a request cut
+        short by the domain's budget or the run deadline, which says nothing
+        of the host, or None for failures that are not definitive
+    """
+    if isinstance(error, DeadlineExceeded):
+        return "deadline"
+    if isinstance(error, socket.gaierror):
+        return "nxdomain" if error.errno in NXDOMAIN_ERRORS else None
+    if isinstance(error, ConnectionRefusedError):
+        return "refused"
+    if isinstance(error, TimeoutError):
+        return "timeout"
+    return None
+
+
+class CircuitBreaker:
+    """Definitive failures of one domain within a run."""
+
+    def __init__(self, timeout_trips=DEFAULT_TIMEOUT_TRIPS):
+        """
+        Args:
+            timeout_trips (int): Tests in a row in which both protocols timed
+                out before the circuit opens
+        """
+        self.timeout_trips = max(1, int(timeout_trips))
+        self.reason = None
+        self._timeouts = 0
+
+    def record(self, http_failure, https_failure):
+        """
+        Record the failures of a test and open the circuit if they are
+        definitive. Tests cut short by a time limit are not recorded.
+
+        Args:
+            http_failure (str): failure_kind of the HTTP request, or None if
+                it got an answer or failed otherwise
+            https_failure (str): failure_kind of the HTTPS request
+
+        Returns:
+            str: Reason the circuit is open, or None while it is closed
+        """
+        if self.reason is not None or "deadline" in (http_failure, https_failure):
+            return self.reason
+
+        if http_failure == https_failure == "timeout":
+            self._timeouts += 1
+            if self._timeouts >= self.timeout_trips:
+                self.reason = (
+                    f"{FAILURE_REASONS['timeout']} in {self._timeouts} tests in a row"
+                )
+        else:
+            self._timeouts = 0
+            if http_failure is not None and http_failure == https_failure:
+                self.reason = FAILURE_REASONS[http_failure]
+
+        return self.reason
+
+
+class BreakerStore:
+    """Cooldowns of domains with an open circuit, stored in a SQLite file."""
+
+    def __init__(
+        self,
+        path,
+        cooldown_hours=DEFAULT_COOLDOWN_HOURS,
+        max_cooldown_hours=DEFAULT_MAX_COOLDOWN_HOURS,
+    ):
+        """
+        Args:
+            path (str): SQLite file to store the cooldowns in
+            cooldown_hours (float): Cooldown after the circuit first opens
+            max_cooldown_hours (float): Longest cooldown after repeated
+                failures
+        """
+        self.path = path
+        self.cooldown_hours = cooldown_hours
+        self.max_cooldown_hours = max_cooldown_hours
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        """Pickle only the settings, so a store can be sent to a worker."""
+        return {
+            "path": self.path,
+            "cooldown_hours": self.cooldown_hours,
+            "max_cooldown_hours": self.max_cooldown_hours,
+        }
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _connect(self):
+        """Open the database on first use, creating the table if needed."""
+        if self._connection is None:
+            self._connection = sqlite3.connect(
+                self.path, timeout=30, check_same_thread=False
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS cooldowns ("
+                "domain TEXT PRIMARY KEY, reason TEXT NOT NULL, "
+                "failures INTEGER NOT NULL, until TEXT NOT NULL)"
+            )
+            self._connection.commit()
+        return self._connection
+
+    def get(self, domain):
+        """
+        Get the cooldown of a domain, even if it has ended.
+
+        Returns:
+            Cooldown: Stored entry, or None if the domain has none
+        """
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT reason, failures, until FROM cooldowns WHERE domain = ?",
+                    (domain,),
+                )
+                .fetchone()
+            )
+        if row is None:
+            return None
+
+        reason, failures, until = row
+        return Cooldown(reason, failures, datetime.fromisoformat(until))
+
+    def active(self, domain):
+        """
+        Get the cooldown of a domain if it has not ended yet.
+
+        Returns:
+            Cooldown: Running cooldown, or None if the domain may be probed
+        """
+        cooldown = self.get(domain)
+        if cooldown is None or cooldown.until <= datetime.now():
+            return None
+        return cooldown
+
+    def trip(self, domain, reason):
+        """
+        Start a cooldown for a domain whose circuit opened.
+
+        Returns:
+            Cooldown: The new cooldown
+        """
+        previous = self.get(domain)
+        failures = previous.failures + 1 if previous else 1
+        hours = min(self.cooldown_hours * 2 ** (failures - 1), self.max_cooldown_hours)
+        cooldown = Cooldown(reason, failures, datetime.now() + timedelta(hours=hours))
+
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO cooldowns (domain, reason, failures, until) "
+                "VALUES (?, ?, ?, ?)",
+                (domain, reason, failures, cooldown.until.isoformat()),
+            )
+            connection.commit()
+        return cooldown
+
+    def reset(self, domain):
+        """Clear the cooldown of a domain that answered again."""
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM cooldowns WHERE domain = ?", (domain,))
+            connection.commit()
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
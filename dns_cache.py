@@ -0,0 +1,193 @@
+"""
+In-process DNS resolution cache.
+
+Resolved addresses are kept for a configured TTL, in a cache bounded to a
+maximum number of hosts (least recently used hosts are evicted first).
+``getaddrinfo`` does not report record TTLs, and querying them separately
+would double the DNS traffic of every host, so the TTL is fixed. Failed
+lookups are cached for a short negative TTL, so an unresolvable host is not
+looked up again on every test.
+"""
+
+import socket
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_TTL = 300
+DEFAULT_NEGATIVE_TTL = 60
+DEFAULT_MAX_ENTRIES = 10000
+
+
+class DNSCache:
+    """Thread-safe, size-bounded DNS cache with a fixed TTL."""
+
+    def __init__(
+        self,
+        default_ttl=DEFAULT_TTL,
+        negative_ttl=DEFAULT_NEGATIVE_TTL,
+        max_entries=DEFAULT_MAX_ENTRIES,
+    ):
+        """
+        Args:
+            default_ttl (float): Seconds to keep a resolved host
+            negative_ttl (float): Seconds to keep a failed lookup
+            max_entries (int): Maximum number of cached hosts
+        """
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max(1, int(max_entries))
+
+        # hostname -> (expires_at, addresses or exception, lookup seconds)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        """Pickle only the settings, so a cache can be sent to a worker."""
+        state = self.__dict__.copy()
+        del state["_entries"], state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, hostname):
+        """Return the cached entry of a host if it has not expired."""
+        with self._lock:
+            entry = self._entries.get(hostname)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[hostname]
+                return None
+            self._entries.move_to_end(hostname)
+            return entry
+
+    def _put(self, hostname, entry):
+        """Store an entry, evicting the least recently used hosts if full."""
+        with self._lock:
+            self._entries[hostname] = entry
+            self._entries.move_to_end(hostname)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _lookup(self, hostname):
+        """Resolve a host and store the result."""
+        start_time = time.monotonic()
+        try:
+            infos = socket.getaddrinfo(hostname, None, 0, socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            lookup_time = time.monotonic() - start_time
+            entry = (time.monotonic() + self.negative_ttl, e, lookup_time)
+            self._put(hostname, entry)
+            return entry
+
+        lookup_time = time.monotonic() - start_time
+        addresses = [
+            (family, type_, proto, sockaddr)
+            for family, type_, proto, _, sockaddr in infos
+        ]
+
+        entry = (time.monotonic() + self.default_ttl, addresses, lookup_time)
+        self._put(hostname, entry)
+        return entry
+
+    def resolve(self, hostname, port):
+        """
+        Resolve a host to the addresses to connect to, using the cache.
+
+        Args:
+            hostname (str): Host to resolve
+            port (int): Port to put in the returned socket addresses
+
+        Returns:
+            list: (family, type, proto, sockaddr) tuples
+
+        Raises:
+            socket.gaierror: If the host does not resolve
+        """
+        return self._addresses(self._get(hostname) or self._lookup(hostname), port)
+
+    def cached(self, hostname, port):
+        """
+        Resolve a host from the cache only, without looking it up.
+
+        Returns:
+            list: (family, type, proto, sockaddr) tuples, or None if the host
+            is not cached
+
+        Raises:
+            socket.gaierror: If the cached lookup failed
+        """
+        entry = self._get(hostname)
+        return None if entry is None else self._addresses(entry, port)
+
+    @staticmethod
+    def _addresses(entry, port):
+        """Return the addresses of an entry with a port, or raise its error."""
+        addresses = entry[1]
+        if isinstance(addresses, Exception):
+            raise addresses
+
+        return [
+            (family, type_, proto, (sockaddr[0], port) + tuple(sockaddr[2:]))
+            for family, type_, proto, sockaddr in addresses
+        ]
+
+    def warm(self, hostname):
+        """Resolve a host into the cache unless it is already cached."""
+        if self._get(hostname) is None:
+            self._lookup(hostname)
+
+    def lookup_time(self, hostname):
+        """Seconds the last uncached lookup of a host took, or None."""
+        entry = self._get(hostname)
+        return entry[2] if entry else None
+
+    def prefetch(self, hostnames, max_workers=50):
+        """
+        Resolve many hosts in parallel to warm the cache.
+
+        Args:
+            hostnames (iterable): Hosts to resolve
+            max_workers (int): Number of lookups running at once
+        """
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            list(executor.map(self.warm, dict.fromkeys(hostnames)))
+
+
+_default_cache = None
+
+
+def get_dns_cache():
+    """Return the process-wide DNS cache, or None if caching is disabled."""
+    return _default_cache
+
+
+def set_dns_cache(cache):
+    """Install a process-wide DNS cache, or disable caching with None."""
+    global _default_cache
+    _default_cache = cache
+
+
+def resolve(hostname, port):
+    """
+    Resolve a host to the addresses to connect to.
+
+    Uses the process-wide cache when one is installed with ``set_dns_cache``.
+
+    Returns:
+        list: (family, type, proto, sockaddr) tuples
+    """
+    if _default_cache is not None:
+        return _default_cache.resolve(hostname, port)
+
+    return [
+        (family, type_, proto, sockaddr)
+        for family, type_, proto, _, sockaddr in socket.getaddrinfo(
+            hostname, port, 0, socket.SOCK_STREAM
+        )
+    ]
@@ -1,162 +1,663 @@
-import requests
-import ssl
-import socket
-from urllib.parse import urlparse
+from collections import namedtuple
+from urllib.parse import urlparse, urlsplit
 from datetime import datetime
+import random
 import time
-import statistics
 
+import numpy as np
 
-def check_domain_health(domain, test_count=5):
+from cert_cache import certificate_fingerprint, certificate_issuer
+from circuit_breaker import CircuitBreaker, failure_kind
+from dns_cache import get_dns_cache
+from http_probe import (
+    DEFAULT_BODY_LIMIT,
+    DEFAULT_BODY_MODE,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_READ_TIMEOUT,
+    PHASES,
+    ConnectionPool,
+    body_request,
+    fetch,
+)
+from records import CheckStatus, ProbeResult, TestSeries
+
+# "connection" reads the certificate from every HTTPS probe's handshake,
+# "once" parses it on the first successful probe of a run and reuses it
+CERT_MODES = ("connection", "once")
+DEFAULT_CERT_MODE = "connection"
+
+# How a protocol reached its page: without redirects in at least one
+# successful test, only through redirects, or not in most tests
+REACHABILITY = ("direct", "redirect-only", "unreachable")
+DIRECT, REDIRECT_ONLY, UNREACHABLE = REACHABILITY
+
+# Seconds between two tests of the same domain, and the maximum random
+# deviation from it so tests of many domains do not fire in lockstep
+DEFAULT_TEST_INTERVAL = 1.0
+DEFAULT_TEST_JITTER = 0.0
+
+
+def jittered_delay(interval, jitter):
     """
-    Check HTTP/HTTPS status and SSL certificate for a domain with multiple tests.
+    Pick a delay around an interval.
 
     Args:
-        domain (str): Domain to check
-        test_count (int): Number of tests to run
+        interval (float): Base delay in seconds
+        jitter (float): Maximum deviation from the interval in seconds
 
     Returns:
-        dict: Aggregated results of all tests
-    """
-    single_results = []
-
-    for test_num in range(test_count):
-        print(f"    Running test {test_num+1}/{test_count}...")
-
-        result = {
-            "domain": domain,
-            "http_status": "FAIL",
-            "https_status": "FAIL",
-            "ssl_valid": "FAIL",
-            "ssl_expiry": None,
-            "http_response_time": None,
-            "https_response_time": None,
-            "error": None,
-        }
-
-        # Add http:// prefix if not present
-        if not domain.startswith("http"):
-            domain_with_http = f"http://{domain}"
-            domain_with_https = f"https://{domain}"
-        else:
-            parsed = urlparse(domain)
-            domain_name = parsed.netloc or parsed.path
-            domain_with_http = f"http://{domain_name}"
-            domain_with_https = f"https://{domain_name}"
+        float: Delay in seconds, never negative
+    """
+    return max(0.0, interval + random.uniform(-jitter, jitter))
+
+
+def parse_domain(domain):
+    """
+    Split a domain entry into its hostname and HTTP/HTTPS URLs.
+
+    Args:
+        domain (str): Domain entry, with or without a URL scheme
+
+    Returns:
+        tuple: (hostname, http_url, https_url)
+    """
+    # Keep only the host of entries given as a URL, whatever the scheme's case
+    if "://" not in domain:
+        domain_name = domain
+    else:
+        parsed = urlsplit(domain)
+        domain_name = parsed.netloc or parsed.path
+
+    domain_with_https = f"https://{domain_name}"
+    hostname = urlparse(domain_with_https).netloc
+
+    return hostname, f"http://{domain_name}", domain_with_https
+
+
+# A domain entry with its hostname and the URLs to probe
+Target = namedtuple("Target", ["domain", "hostname", "http_url", "https_url"])
+
+
+def make_target(domain):
+    """
+    Parse a domain entry into a Target.
+
+    Args:
+        domain (str or Target): Domain entry, with or without a URL scheme;
+            targets are returned as they are
+
+    Returns:
+        Target: Parsed domain entry
+    """
+    if isinstance(domain, Target):
+        return domain
+    hostname, http_url, https_url = parse_domain(domain)
+    return Target(domain, hostname, http_url, https_url)
+
+
+def parse_certificate_expiry(cert):
+    """
+    Get the expiry date of a certificate returned by ``getpeercert``.
+
+    Args:
+        cert (dict): Peer certificate
+
+    Returns:
+        datetime: Expiry date of the certificate
+    """
+    return datetime.strptime(cert["notAfter"], "%b %d %H:%M:%S %Y %Z")
+
+
+class DomainProbe:
+    """Probe state of a domain, shared across its tests within a run."""
+
+    def __init__(
+        self,
+        domain,
+        cert_mode=DEFAULT_CERT_MODE,
+        reuse_connections=False,
+        cert_cache=None,
+        body_mode=DEFAULT_BODY_MODE,
+        body_limit=DEFAULT_BODY_LIMIT,
+        cache_redirects=False,
+        record_hops=False,
+        connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+        read_timeout=DEFAULT_READ_TIMEOUT,
+        deadline=None,
+        circuit_breaker=False,
+        breaker_store=None,
+    ):
+        """
+        Args:
+            domain (str or Target): Domain to check, possibly pre-parsed
+            cert_mode (str): "connection" to read the certificate from the
+                HTTPS connection of every test, or "once" to parse it on the
+                first successful test and reuse it for the rest of the run
+            reuse_connections (bool): Keep connections alive between tests, so
+                later tests measure warm-connection latency
+            cert_cache (CertificateCache): Optional persistent store of the
+                certificates of earlier runs, to detect replaced certificates
+            body_mode (str): How much of each response to download, see
+                http_probe.BODY_MODES
+            body_limit (int): Maximum body bytes read in "capped" mode
+            cache_redirects (bool): Once a URL's redirects led to a page,
+                request that page directly in later tests
+            record_hops (bool): Keep every redirect hop of every test, with
+                its URL, status code and latency
+            connect_timeout (float): Seconds to wait for each TCP connect and
+                TLS handshake
+            read_timeout (float): Seconds to wait for each read of a response
+            deadline (float): Optional time.time() deadline of the whole run;
+                requests are cut short when it passes
+            circuit_breaker (bool): Stop testing the domain after a
+                definitive failure, see circuit_breaker.CircuitBreaker
+            breaker_store (BreakerStore): Optional store of the cooldowns of
+                domains whose circuit opened, shared across runs
+        """
+        if cert_mode not in CERT_MODES:
+            raise ValueError(
+                f"Unknown certificate mode '{cert_mode}', expected one of {CERT_MODES}"
+            )
+
+        target = make_target(domain)
+        self.domain = target.domain
+        self.hostname = target.hostname
+        self.http_url = target.http_url
+        self.https_url = target.https_url
+        self.dns_name = urlsplit(self.https_url).hostname
+        self.cert_mode = cert_mode
+        self.ssl_expiry = None
+        self.cert_cache = cert_cache
+        # Expiry dates of the certificates received, by raw certificate
+        self.cert_expiries = {}
+        self.certificate_change = None
+        self.pool = ConnectionPool() if reuse_connections else None
+        self.method, self.body_limit = body_request(body_mode, body_limit)
+        self.redirect_targets = {} if cache_redirects else None
+        self.record_hops = record_hops
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+        # Deadlines on the monotonic clock: the run's, and the domain's own
+        # once its budget is started
+        self.run_deadline = (
+            None if deadline is None else time.monotonic() + deadline - time.time()
+        )
+        self.budget_deadline = None
+
+        self.breaker = CircuitBreaker() if circuit_breaker else None
+        self.breaker_store = breaker_store if circuit_breaker else None
+
+    def breaker_reason(self):
+        """Return why the domain's circuit is open, or None if it is closed."""
+        return self.breaker.reason if self.breaker is not None else None
+
+    def cooldown(self):
+        """
+        Get the cooldown an earlier run started for the domain.
+
+        Returns:
+            Cooldown: Running cooldown, or None if the domain may be tested
+        """
+        if self.breaker_store is None:
+            return None
+        return self.breaker_store.active(self.domain)
+
+    def update_cooldown(self, result):
+        """Start or clear the domain's cooldown from its aggregated result."""
+        if self.breaker_store is None:
+            return
+        if result.get("skip_reason"):
+            self.breaker_store.trip(self.domain, result["skip_reason"])
+        elif (
+            result["http_success_rate"] or result["https_success_rate"]
+        ) and self.breaker_store.get(self.domain) is not None:
+            self.breaker_store.reset(self.domain)
+
+    def start_budget(self, budget=None):
+        """
+        Start the domain's time budget, if it is not running yet.
+
+        Args:
+            budget (float): Seconds of wall-clock time the domain's tests may
+                take in total, or None for no limit
+        """
+        if budget and self.budget_deadline is None:
+            self.budget_deadline = time.monotonic() + budget
+
+    def deadline(self):
+        """Return the monotonic time the domain's requests must end by, or None."""
+        deadlines = [
+            deadline
+            for deadline in (self.run_deadline, self.budget_deadline)
+            if deadline is not None
+        ]
+        return min(deadlines) if deadlines else None
+
+    def out_of_time(self):
+        """Check whether the domain's budget or the run deadline has passed."""
+        deadline = self.deadline()
+        return deadline is not None and time.monotonic() >= deadline
+
+    def past_run_deadline(self):
+        """Check whether the run deadline has passed."""
+        return self.run_deadline is not None and time.monotonic() >= self.run_deadline
+
+    def can_skip_redirects(self, url, final_url):
+        """
+        Check whether later tests may request a redirect target directly.
+
+        An HTTPS test reads the certificate of the first host it connects to,
+        so redirects to another host are only skipped when the certificate is
+        not read again in later tests.
+        """
+        return (
+            urlsplit(url).scheme != "https"
+            or self.cert_mode == "once"
+            or urlsplit(url).hostname == urlsplit(final_url).hostname
+        )
+
+    def fetch(self, url):
+        """
+        Request a URL with the probe's method, body limit and pool.
+
+        With the redirect cache, a URL that redirected to a page in an
+        earlier test is requested at that page directly. The response's
+        "redirects" counts the redirects between the URL and its page,
+        including the ones skipped that way, and "redirect_time" is the time
+        spent on the redirect hops that were followed, or None.
+        """
+        target, skipped = url, 0
+        if self.redirect_targets is not None:
+            target, skipped = self.redirect_targets.get(url, (url, 0))
+
+        try:
+            response = fetch(
+                target,
+                timeout=self.read_timeout,
+                method=self.method,
+                pool=self.pool,
+                body_limit=self.body_limit,
+                connect_timeout=self.connect_timeout,
+                deadline=self.deadline(),
+            )
+        except Exception:
+            # Walk the whole chain again next time
+            if self.redirect_targets is not None:
+                self.redirect_targets.pop(url, None)
+            raise
+
+        redirect_hops = response["hops"][:-1]
+        response["redirects"] = skipped + len(redirect_hops)
+        response["redirect_time"] = (
+            sum(hop["elapsed"] for hop in redirect_hops) if redirect_hops else None
+        )
+
+        if self.redirect_targets is not None:
+            if response["status_code"] != 200:
+                self.redirect_targets.pop(url, None)
+            elif redirect_hops and self.can_skip_redirects(url, response["url"]):
+                self.redirect_targets[url] = (response["url"], response["redirects"])
+
+        return response
+
+    def certificate_expiry(self, response):
+        """
+        Get the expiry date of the certificate received by an HTTPS fetch.
+
+        Each distinct certificate is parsed once per run, and recorded in the
+        certificate cache if there is one; a certificate that replaced the
+        one an earlier run recorded is kept in ``certificate_change``.
+
+        Args:
+            response (dict): Response returned by fetch
+
+        Returns:
+            datetime: Expiry date of the certificate
+        """
+        der = response["peercert_der"]
+        expire_date = self.cert_expiries.get(der)
+        if expire_date is not None:
+            return expire_date
+
+        cert = response["peercert"]
+        expire_date = parse_certificate_expiry(cert)
+        self.cert_expiries[der] = expire_date
+
+        if self.cert_cache is not None:
+            issuer = certificate_issuer(cert)
+            previous = self.cert_cache.record(
+                self.dns_name, certificate_fingerprint(der), expire_date, issuer
+            )
+            if previous is not None:
+                self.certificate_change = {
+                    "previous_issuer": previous.issuer,
+                    "previous_expiry": previous.not_after,
+                    "issuer": issuer,
+                    "expiry": expire_date,
+                }
+        return expire_date
+
+    def close(self):
+        """Close the connections kept alive between tests."""
+        if self.pool is not None:
+            self.pool.close()
+
+    def run_test(self):
+        """
+        Run one HTTP/HTTPS/SSL test against the domain.
+
+        Requests still running when the domain's budget runs out fail with a
+        timeout, but are not counted by the circuit breaker. A test that
+        failed because the run deadline passed is dropped, since it says
+        nothing of the domain. Definitive failures are recorded in the
+        circuit breaker.
+
+        Returns:
+            ProbeResult: Result of the single test, or None if the run
+            deadline cut it short
+        """
+        result = dict(
+            http_status=CheckStatus.ERROR,
+            http_code=None,
+            https_status=CheckStatus.ERROR,
+            https_code=None,
+            ssl_ok=False,
+            ssl_expiry=None,
+            http_response_time=None,
+            https_response_time=None,
+            http_connection_reused=False,
+            https_connection_reused=False,
+            http_phases=None,
+            https_phases=None,
+            dns_time=None,
+            http_bytes=0,
+            https_bytes=0,
+            http_redirects=0,
+            https_redirects=0,
+            http_redirect_time=None,
+            https_redirect_time=None,
+            http_hops=None,
+            https_hops=None,
+            error=None,
+        )
+        http_failure = https_failure = None
 
         # Check HTTP
         try:
-            start_time = time.time()
-            http_response = requests.get(domain_with_http, timeout=10)
-            http_time = time.time() - start_time
-            result["http_response_time"] = http_time
+            http_response = self.fetch(self.http_url)
+            result["http_response_time"] = http_response["elapsed"]
+            result["http_bytes"] = http_response["bytes_received"]
+            result["http_redirects"] = http_response["redirects"]
+            result["http_redirect_time"] = http_response["redirect_time"]
+            if self.record_hops:
+                result["http_hops"] = http_response["hops"]
+            result["http_connection_reused"] = http_response["reused"]
+            result["http_phases"] = http_response["timings"]
+            result["http_code"] = http_response["status_code"]
             result["http_status"] = (
-                "OK"
-                if http_response.status_code == 200
-                else f"FAIL ({http_response.status_code})"
+                CheckStatus.OK
+                if http_response["status_code"] == 200
+                else CheckStatus.FAIL
             )
         except Exception as e:
-            result["http_status"] = f"FAIL (Error)"
+            result["http_status"] = CheckStatus.ERROR
             result["error"] = str(e)
+            http_failure = failure_kind(e)
 
-        # Check HTTPS and SSL
+        # Check HTTPS and SSL on the same connection
         try:
-            start_time = time.time()
-            https_response = requests.get(domain_with_https, timeout=10)
-            https_time = time.time() - start_time
-            result["https_response_time"] = https_time
+            https_response = self.fetch(self.https_url)
+            result["https_response_time"] = https_response["elapsed"]
+            result["https_bytes"] = https_response["bytes_received"]
+            result["https_redirects"] = https_response["redirects"]
+            result["https_redirect_time"] = https_response["redirect_time"]
+            if self.record_hops:
+                result["https_hops"] = https_response["hops"]
+            result["https_connection_reused"] = https_response["reused"]
+            result["https_phases"] = https_response["timings"]
+            result["https_code"] = https_response["status_code"]
             result["https_status"] = (
-                "OK"
-                if https_response.status_code == 200
-                else f"FAIL ({https_response.status_code})"
+                CheckStatus.OK
+                if https_response["status_code"] == 200
+                else CheckStatus.FAIL
             )
 
-            # Extract domain name without protocol
-            hostname = urlparse(domain_with_https).netloc
+            # The handshake verified the certificate, only its expiry is left
+            expire_date = self.ssl_expiry
+            if expire_date is None or self.cert_mode == "connection":
+                expire_date = self.certificate_expiry(https_response)
+                if self.cert_mode == "once":
+                    self.ssl_expiry = expire_date
 
-            # Check SSL certificate
-            context = ssl.create_default_context()
-            with socket.create_connection((hostname, 443), timeout=10) as sock:
-                with context.wrap_socket(sock, server_hostname=hostname) as ssock:
-                    cert = ssock.getpeercert()
+            result["ssl_ok"] = True
+            result["ssl_expiry"] = expire_date
 
-                    # Get expiry date
-                    expire_date_str = cert["notAfter"]
-                    expire_date = datetime.strptime(
-                        expire_date_str, "%b %d %H:%M:%S %Y %Z"
-                    )
+        except Exception as e:
+            result["https_status"] = CheckStatus.ERROR
+            result["ssl_ok"] = False
+            result["error"] = str(e)
+            https_failure = failure_kind(e)
 
-                    # Calculate days until expiry
-                    days_left = (expire_date - datetime.now()).days
+        # Report DNS time on its own; with a cache the phases only show hits
+        dns_cache = get_dns_cache()
+        if dns_cache is not None:
+            result["dns_time"] = dns_cache.lookup_time(self.dns_name)
+        if result["dns_time"] is None:
+            result["dns_time"] = next(
+                (
+                    phases["dns"]
+                    for phases in (result["http_phases"], result["https_phases"])
+                    if phases
+                ),
+                None,
+            )
 
-                    result["ssl_valid"] = "OK"
-                    result["ssl_expiry"] = expire_date
-                    result["days_until_expiry"] = days_left
+        if result["error"] is not None and self.past_run_deadline():
+            return None
 
-        except Exception as e:
-            result["https_status"] = "FAIL (Error)"
-            result["ssl_valid"] = "FAIL"
-            result["error"] = str(e)
+        if self.breaker is not None:
+            self.breaker.record(http_failure, https_failure)
+
+        return ProbeResult(**result)
+
+
+def percentile(values, pct):
+    """
+    Compute a percentile with linear interpolation between closest ranks.
 
-        single_results.append(result)
+    Args:
+        values (list): Numbers to compute the percentile of
+        pct (float): Percentile between 0 and 100
+
+    Returns:
+        float: The percentile, or None if there are no values
+    """
+    if not values:
+        return None
+
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def summarize_phases(series, protocol):
+    """
+    Summarize the phase timings of a protocol over the tests of a domain.
+
+    Args:
+        series (TestSeries): Tests of the domain
+        protocol (str): "http" or "https"
+
+    Returns:
+        dict: Mean, p50 and p95 in seconds for each phase, or None if no test
+        has phase timings
+    """
+    # One row per test, one column per phase; tests without timings are NaN
+    values = series.column(f"{protocol}_phases")
+    values = values[~np.isnan(values).any(axis=1)]
+    if not len(values):
+        return None
+
+    means = values.mean(axis=0)
+    p50, p95 = np.percentile(values, [50, 95], axis=0)
+
+    return {
+        phase: {"mean": float(means[i]), "p50": float(p50[i]), "p95": float(p95[i])}
+        for i, phase in enumerate(PHASES)
+    }
+
+
+def mean_of(values):
+    """Mean of the non-NaN values, or None if there are none."""
+    values = values[~np.isnan(values)]
+    return float(values.mean()) if values.size else None
+
+
+def response_times(series, protocol):
+    """Response times of a protocol, with failed (zero) times as NaN."""
+    times = series.column(f"{protocol}_response_time")
+    return np.where(times == 0, np.nan, times)
+
+
+def sampling_settled(series, max_tests, latency_cv=0.0):
+    """
+    Check whether more tests of a domain are unlikely to change its results.
+
+    The results are settled once none of the HTTP, HTTPS and SSL majority
+    verdicts can flip within the tests left, or, with ``latency_cv``, once
+    every test so far agrees and the response times of each reachable
+    protocol vary by less than that coefficient of variation.
+
+    Args:
+        series (TestSeries): Tests run so far
+        max_tests (int): Maximum number of tests of the domain
+        latency_cv (float): Standard deviation to mean ratio of the response
+            times below which stable results are settled; 0 disables it
+
+    Returns:
+        bool: True if no more tests are needed
+    """
+    tested = len(series)
+    remaining = max_tests - tested
+    ok_counts = [
+        np.count_nonzero(series.column("http_status") == CheckStatus.OK),
+        np.count_nonzero(series.column("https_status") == CheckStatus.OK),
+        np.count_nonzero(series.column("ssl_ok")),
+    ]
+
+    # The verdict at max_tests is OK with at least max_tests / 2 successes
+    if all(
+        count >= max_tests / 2 or count + remaining < max_tests / 2
+        for count in ok_counts
+    ):
+        return True
+
+    if not latency_cv or any(0 < count < tested for count in ok_counts):
+        return False
+
+    spreads = []
+    for protocol in ("http", "https"):
+        times = response_times(series, protocol)
+        times = times[~np.isnan(times)]
+        if times.size:
+            if times.size < 2:
+                return False
+            spreads.append(times.std() / times.mean())
+    return bool(spreads) and max(spreads) < latency_cv
 
-        # Small delay between tests to avoid rate limiting
-        if test_num < test_count - 1:
-            time.sleep(1)
 
-    # Aggregate results
+def aggregate_results(domain, series, test_count):
+    """
+    Aggregate the individual test results of a domain.
+
+    Args:
+        domain (str): Domain that was checked
+        series (TestSeries): Tests of the domain
+        test_count (int): Number of tests that were run
+
+    Returns:
+        dict: Aggregated results of all tests; ``test_results`` holds the
+        series, which yields the per-test dicts when iterated
+    """
+    # Successful tests of HTTP, HTTPS and SSL, in that order
+    ok_counts = np.array(
+        [
+            np.count_nonzero(series.column("http_status") == CheckStatus.OK),
+            np.count_nonzero(series.column("https_status") == CheckStatus.OK),
+            np.count_nonzero(series.column("ssl_ok")),
+        ]
+    )
+    success_rates = ok_counts / test_count * 100
+    verdicts = ["OK" if count >= test_count / 2 else "FAIL" for count in ok_counts]
+
+    expiries = series.column("ssl_expiry")
+    expiries = expiries[~np.isnan(expiries)]
+
     aggregated_result = {
         "domain": domain,
-        "http_status": (
-            "OK"
-            if sum(1 for r in single_results if r["http_status"].startswith("OK"))
-            >= (test_count / 2)
-            else "FAIL"
-        ),
-        "https_status": (
-            "OK"
-            if sum(1 for r in single_results if r["https_status"].startswith("OK"))
-            >= (test_count / 2)
-            else "FAIL"
-        ),
-        "ssl_valid": (
-            "OK"
-            if sum(1 for r in single_results if r["ssl_valid"] == "OK")
-            >= (test_count / 2)
-            else "FAIL"
-        ),
-        "ssl_expiry": next(
-            (r["ssl_expiry"] for r in single_results if r["ssl_expiry"]), None
-        ),
-        "http_success_rate": sum(
-            1 for r in single_results if r["http_status"].startswith("OK")
-        )
-        / test_count
-        * 100,
-        "https_success_rate": sum(
-            1 for r in single_results if r["https_status"].startswith("OK")
-        )
-        / test_count
-        * 100,
-        "ssl_success_rate": sum(1 for r in single_results if r["ssl_valid"] == "OK")
-        / test_count
-        * 100,
-        "test_results": single_results,
+        "http_status": verdicts[0],
+        "https_status": verdicts[1],
+        "ssl_valid": verdicts[2],
+        "ssl_expiry": (datetime.fromtimestamp(expiries[0]) if expiries.size else None),
+        "http_success_rate": float(success_rates[0]),
+        "https_success_rate": float(success_rates[1]),
+        "ssl_success_rate": float(success_rates[2]),
+        "http_bytes_received": int(series.column("http_bytes").sum()),
+        "https_bytes_received": int(series.column("https_bytes").sum()),
+        "test_results": series,
     }
 
-    # Calculate average response times (only for successful requests)
-    http_times = [
-        r["http_response_time"] for r in single_results if r["http_response_time"]
-    ]
-    https_times = [
-        r["https_response_time"] for r in single_results if r["https_response_time"]
-    ]
+    # Calculate average response times (only for successful requests) and
+    # the average DNS resolution time, separate from the HTTP timings
+    for key, values in (
+        ("avg_http_response_time", response_times(series, "http")),
+        ("avg_https_response_time", response_times(series, "https")),
+        ("avg_dns_time", series.column("dns_time")),
+    ):
+        mean = mean_of(values)
+        if mean is not None:
+            aggregated_result[key] = mean
 
-    if http_times:
-        aggregated_result["avg_http_response_time"] = statistics.mean(http_times)
+    # Report whether each protocol only reached its page through redirects,
+    # with the time spent on them and the first redirect chain recorded
+    for protocol, verdict in (("http", verdicts[0]), ("https", verdicts[1])):
+        ok = series.column(f"{protocol}_status") == CheckStatus.OK
+        redirected = series.column(f"{protocol}_redirects") > 0
+        if verdict != "OK":
+            reachability = UNREACHABLE
+        elif redirected[ok].all():
+            reachability = REDIRECT_ONLY
+        else:
+            reachability = DIRECT
+        aggregated_result[f"{protocol}_reachability"] = reachability
 
-    if https_times:
-        aggregated_result["avg_https_response_time"] = statistics.mean(https_times)
+        mean = mean_of(series.column(f"{protocol}_redirect_time"))
+        if mean is not None:
+            aggregated_result[f"avg_{protocol}_redirect_time"] = mean
+
+        chain = next(
+            (hops for hops in getattr(series, f"{protocol}_hops") if hops), None
+        )
+        if chain and len(chain) > 1:
+            aggregated_result[f"{protocol}_redirect_chain"] = chain
+
+    # Summarize the time spent in each phase of the requests
+    for protocol in ("http", "https"):
+        phase_stats = summarize_phases(series, protocol)
+        if phase_stats:
+            aggregated_result[f"{protocol}_phase_stats"] = phase_stats
+
+    # Split response times by cold (new) and warm (reused) connections
+    for protocol in ("http", "https"):
+        times = response_times(series, protocol)
+        reused = series.column(f"{protocol}_connection_reused") == 1
+        for label, mask in (("cold", ~reused), ("warm", reused)):
+            mean = mean_of(times[mask])
+            if mean is not None:
+                aggregated_result[f"avg_{protocol}_{label}_response_time"] = mean
 
     # Get days until expiry if SSL is valid
     if aggregated_result["ssl_valid"] == "OK" and aggregated_result["ssl_expiry"]:
@@ -167,16 +668,189 @@ def check_domain_health(domain, test_count=5):
     return aggregated_result
 
 
-def read_domains_from_file(file_path):
+def check_domain_health(
+    domain,
+    test_count=5,
+    cert_mode=DEFAULT_CERT_MODE,
+    reuse_connections=False,
+    test_interval=DEFAULT_TEST_INTERVAL,
+    test_jitter=DEFAULT_TEST_JITTER,
+    cert_cache=None,
+    body_mode=DEFAULT_BODY_MODE,
+    body_limit=DEFAULT_BODY_LIMIT,
+    cache_redirects=False,
+    record_hops=False,
+    min_test_count=None,
+    latency_cv=0.0,
+    connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+    read_timeout=DEFAULT_READ_TIMEOUT,
+    domain_budget=None,
+    deadline=None,
+    circuit_breaker=False,
+    breaker_store=None,
+):
     """
-    Read domain list from a text file.
+    Check HTTP/HTTPS status and SSL certificate for a domain with multiple tests.
+
+    Tests stop when the domain's budget or the run deadline runs out; the
+    tests done so far are aggregated and the result is marked "incomplete".
+    With the circuit breaker, they also stop after a definitive failure, and
+    the result records the reason in "skip_reason".
 
     Args:
-        file_path (str): Path to the text file containing one domain per line
+        domain (str): Domain to check
+        test_count (int): Number of tests to run, or the maximum number with
+            min_test_count
+        min_test_count (int): Run at least this many tests, then stop as
+            soon as the results are settled (see sampling_settled); None
+            always runs test_count tests
+        latency_cv (float): Latency variation threshold, see sampling_settled
+        cert_mode (str): Certificate mode, see DomainProbe
+        reuse_connections (bool): Keep connections alive between tests
+        test_interval (float): Seconds to wait between two tests
+        test_jitter (float): Maximum random deviation from test_interval
+        cert_cache (CertificateCache): Optional persistent certificate store
+        body_mode (str): How much of each response to download, see
+            http_probe.BODY_MODES
+        body_limit (int): Maximum body bytes read in "capped" mode
+        cache_redirects (bool): Request redirect targets directly once known
+        record_hops (bool): Keep every redirect hop of every test
+        connect_timeout (float): Seconds to wait for each TCP connect and TLS
+            handshake
+        read_timeout (float): Seconds to wait for each read of a response
+        domain_budget (float): Seconds all tests of the domain may take in
+            total, or None for no limit
+        deadline (float): Optional time.time() deadline of the whole run
+        circuit_breaker (bool): Skip the remaining tests after a definitive
+            failure, see circuit_breaker.CircuitBreaker
+        breaker_store (BreakerStore): Optional store of cooldowns across
+            runs; a domain in cooldown is not tested at all
 
     Returns:
-        list: List of domain strings
+        dict: Aggregated results of all tests, or None if the run deadline
+        passed before any test completed
     """
-    with open(file_path, "r") as file:
-        domains = [line.strip() for line in file if line.strip()]
-    return domains
+    probe = DomainProbe(
+        domain,
+        cert_mode,
+        reuse_connections,
+        cert_cache,
+        body_mode,
+        body_limit,
+        cache_redirects,
+        record_hops,
+        connect_timeout,
+        read_timeout,
+        deadline,
+        circuit_breaker,
+        breaker_store,
+    )
+    series = TestSeries(probe.domain)
+    incomplete = False
+
+    cooldown = probe.cooldown()
+    if cooldown is not None:
+        return cooldown_result(probe.domain, cooldown, test_count)
+
+    try:
+        probe.start_budget(domain_budget)
+        for test_num in range(test_count):
+            if probe.out_of_time():
+                incomplete = True
+                break
+
+            print(f"    Running test {test_num+1}/{test_count}...")
+
+            result = probe.run_test()
+            if result is None:
+                incomplete = True
+                break
+            series.append(result)
+
+            if probe.breaker_reason() is not None:
+                break
+
+            if (
+                min_test_count is not None
+                and len(series) >= min_test_count
+                and sampling_settled(series, test_count, latency_cv)
+            ):
+                break
+
+            # Small delay between tests to avoid rate limiting
+            if test_num < test_count - 1:
+                delay = jittered_delay(test_interval, test_jitter)
+                deadline_at = probe.deadline()
+                if deadline_at is not None:
+                    delay = min(delay, max(0.0, deadline_at - time.monotonic()))
+                time.sleep(delay)
+    finally:
+        probe.close()
+
+    return finish_results(probe, series, test_count, incomplete)
+
+
+def finish_results(probe, series, test_count, incomplete=False):
+    """
+    Aggregate the tests a domain ran, flagging tests cut short by time limits
+    or skipped by the circuit breaker, and update the domain's cooldown.
+
+    Args:
+        probe (DomainProbe): Probe of the domain that was checked
+        series (TestSeries): Tests that completed
+        test_count (int): Number of tests the domain was due to run
+        incomplete (bool): Whether time limits stopped the tests early
+
+    Returns:
+        dict: Aggregated results, or None if no test completed
+    """
+    if not len(series):
+        return None
+
+    result = aggregate_results(probe.domain, series, len(series))
+    if incomplete:
+        result["incomplete"] = True
+
+    if probe.certificate_change is not None:
+        result["certificate_change"] = probe.certificate_change
+
+    reason = probe.breaker_reason()
+    if reason is not None:
+        result["skip_reason"] = reason
+        result["tests_skipped"] = max(0, test_count - len(series))
+    probe.update_cooldown(result)
+    return result
+
+
+def cooldown_result(domain, cooldown, test_count):
+    """
+    Build the result of a domain skipped because of a running cooldown.
+
+    Args:
+        domain (str): Domain that was skipped
+        cooldown (Cooldown): Cooldown returned by BreakerStore.active
+        test_count (int): Number of tests the domain was due to run
+
+    Returns:
+        dict: Failed result without tests, with the reason in "skip_reason"
+    """
+    return {
+        "domain": domain,
+        "http_status": "FAIL",
+        "https_status": "FAIL",
+        "ssl_valid": "FAIL",
+        "ssl_expiry": None,
+        "http_success_rate": 0.0,
+        "https_success_rate": 0.0,
+        "ssl_success_rate": 0.0,
+        "http_bytes_received": 0,
+        "https_bytes_received": 0,
+        "http_reachability": UNREACHABLE,
+        "https_reachability": UNREACHABLE,
+        "test_results": TestSeries(domain),
+        "skip_reason": (
+            f"{cooldown.reason}; cooling down until "
+            f"{cooldown.until.strftime('%Y-%m-%d %H:%M')}"
+        ),
+        "tests_skipped": test_count,
+    }
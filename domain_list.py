@@ -0,0 +1,138 @@
+"""
+Streaming domain list reader.
+
+Reads domain lists of any size one line at a time, from plain text or gzip
+files, skipping blank lines and ``#`` comments. Entries are normalized to a
+lowercase ``host[:port]`` and duplicates are dropped with a Bloom filter, so
+memory stays bounded no matter how long the list is. Each entry is handed to
+the probers as a pre-parsed ``Target``.
+"""
+
+import gzip
+import hashlib
+import math
+from urllib.parse import urlsplit
+
+from domain_checker import make_target, parse_domain
+
+DEFAULT_DEDUP_CAPACITY = 5_000_000
+DEFAULT_DEDUP_ERROR_RATE = 1e-6
+
+def normalize_domain(entry):
+    """
+    Normalize a domain entry to a lowercase host, keeping an explicit port.
+
+    Args:
+        entry (str): Domain entry, possibly with a scheme, path or trailing dot
+
+    Returns:
+        str: Normalized domain, or None if the entry has no host
+    """
+    hostname, _, _ = parse_domain(entry.strip())
+    try:
+        parts = urlsplit(f"//{hostname}")
+        host, port = parts.hostname, parts.port
+    except ValueError:
+        return None
+
+    host = (host or "").rstrip(".")
+    if not host:
+        return None
+
+    # Internationalized names are probed by their ASCII form
+    try:
+        host = host.encode("idna").decode("ascii")
+    except UnicodeError:
+        pass
+
+    if ":" in host:
+        host = f"[{host}]"  # IPv6 literal
+    return f"{host}:{port}" if port else host
+
+
+class BloomFilter:
+    """
+    Fixed-size set membership filter for deduplicating huge lists.
+
+    Memory is fixed by the capacity and error rate. Membership tests can give
+    false positives at about the error rate, never false negatives.
+    """
+
+    def __init__(
+        self, capacity=DEFAULT_DEDUP_CAPACITY, error_rate=DEFAULT_DEDUP_ERROR_RATE
+    ):
+        """
+        Args:
+            capacity (int): Number of items the filter is sized for
+            error_rate (float): False positive rate at full capacity
+        """
+        capacity = max(1, int(capacity))
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        """Bit positions of an item, by double hashing one digest."""
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, item):
+        """
+        Add an item to the filter.
+
+        Returns:
+            bool: True if the item was (probably) already in the filter
+        """
+        seen = True
+        for position in self._positions(item):
+            byte, bit = divmod(position, 8)
+            if not self._bits[byte] & (1 << bit):
+                seen = False
+                self._bits[byte] |= 1 << bit
+        return seen
+
+
+def open_domain_file(file_path):
+    """Open a domain list as text, decompressing gzip files."""
+    with open(file_path, "rb") as file:
+        is_gzip = file.read(2) == b"\x1f\x8b"
+
+    if is_gzip:
+        return gzip.open(file_path, "rt", encoding="utf-8", errors="replace")
+    return open(file_path, "r", encoding="utf-8", errors="replace")
+
+
+def iter_targets(
+    file_path,
+    dedup_capacity=DEFAULT_DEDUP_CAPACITY,
+    dedup_error_rate=DEFAULT_DEDUP_ERROR_RATE,
+):
+    """
+    Stream the domains of a list file as pre-parsed targets.
+
+    Args:
+        file_path (str): Path to a text or gzip file with one domain per line;
+            ``#`` starts a comment
+        dedup_capacity (int): Number of distinct domains the duplicate filter
+            is sized for
+        dedup_error_rate (float): Chance of dropping a distinct domain as a
+            duplicate at full capacity
+
+    Yields:
+        Target: One target per distinct domain, in file order
+    """
+    seen = BloomFilter(dedup_capacity, dedup_error_rate)
+
+    with open_domain_file(file_path) as file:
+        for line in file:
+            entry = line.split("#", 1)[0].strip()
+            if not entry:
+                continue
+
+            domain = normalize_domain(entry)
+            if domain is None or seen.add(domain):
+                continue
+
+            yield make_target(domain)
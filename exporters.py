@@ -0,0 +1,254 @@
+"""
+Machine-readable exports of the results.
+
+Writes the aggregated results and their per-test results as plain JSON Lines
+(one domain per line, tests nested, with any recorded redirect hops), as two
+CSV files, or as two Parquet files, so dashboards can load a run without parsing the text report.
+Datetimes are written as ISO 8601 strings in JSON Lines and CSV, and as
+timestamp columns in Parquet.
+
+JSON Lines and CSV are written while iterating the results. Parquet is
+columnar, so its rows are collected into pandas DataFrames first; pandas
+needs ``pyarrow`` or ``fastparquet`` installed to write it.
+"""
+
+import csv
+import json
+import os
+from datetime import datetime
+
+from http_probe import PHASES
+
+EXPORT_FORMATS = ("jsonl", "csv", "parquet")
+
+# Columns of the one-row-per-domain table; phase statistics are added as
+# <protocol>_<phase>_<statistic> columns
+SUMMARY_COLUMNS = [
+    "domain",
+    "http_status",
+    "https_status",
+    "ssl_valid",
+    "ssl_expiry",
+    "days_until_expiry",
+    "http_success_rate",
+    "https_success_rate",
+    "ssl_success_rate",
+    "incomplete",
+    "skip_reason",
+    "tests_skipped",
+    "http_bytes_received",
+    "https_bytes_received",
+    "http_reachability",
+    "https_reachability",
+    "avg_http_redirect_time",
+    "avg_https_redirect_time",
+    "avg_http_response_time",
+    "avg_https_response_time",
+    "avg_dns_time",
+    "avg_http_cold_response_time",
+    "avg_http_warm_response_time",
+    "avg_https_cold_response_time",
+    "avg_https_warm_response_time",
+] + [
+    f"{protocol}_{phase}_{statistic}"
+    for protocol in ("http", "https")
+    for phase in PHASES
+    for statistic in ("mean", "p50", "p95")
+]
+
+# Columns of the one-row-per-test table; phase timings are added as
+# <protocol>_<phase> columns
+TEST_COLUMNS = [
+    "domain",
+    "test",
+    "http_status",
+    "https_status",
+    "ssl_valid",
+    "ssl_expiry",
+    "days_until_expiry",
+    "http_response_time",
+    "https_response_time",
+    "http_connection_reused",
+    "https_connection_reused",
+    "dns_time",
+    "http_bytes",
+    "https_bytes",
+    "http_redirects",
+    "https_redirects",
+    "http_redirect_time",
+    "https_redirect_time",
+    "error",
+] + [f"{protocol}_{phase}" for protocol in ("http", "https") for phase in PHASES]
+
+
+def encode_value(value):
+    """JSON encoder hook writing datetimes as ISO 8601 strings."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def summary_row(result):
+    """
+    Flatten an aggregated result into a row of SUMMARY_COLUMNS.
+
+    Returns:
+        dict: Column values, None where the result has no value
+    """
+    row = {column: result.get(column) for column in SUMMARY_COLUMNS}
+    for protocol in ("http", "https"):
+        for phase, values in (result.get(f"{protocol}_phase_stats") or {}).items():
+            for statistic, value in values.items():
+                row[f"{protocol}_{phase}_{statistic}"] = value
+    return row
+
+
+def test_rows(result):
+    """
+    Flatten the per-test results of an aggregated result.
+
+    Yields:
+        dict: One row of TEST_COLUMNS per test, numbered from 1
+    """
+    for index, test in enumerate(result.get("test_results") or (), 1):
+        row = {column: test.get(column) for column in TEST_COLUMNS}
+        row["domain"] = result["domain"]
+        row["test"] = index
+        for protocol in ("http", "https"):
+            for phase, value in (test.get(f"{protocol}_phases") or {}).items():
+                row[f"{protocol}_{phase}"] = value
+        yield row
+
+
+def export_jsonl(results, path):
+    """
+    Write one JSON object per domain, with its tests in ``test_results``.
+
+    Args:
+        results (iterable): Aggregated results returned by check_domain_health
+        path (str): File to write
+
+    Returns:
+        int: Number of domains written
+    """
+    count = 0
+    with open(path, "w", encoding="utf-8") as file:
+        for result in results:
+            record = dict(result)
+            record["test_results"] = list(result.get("test_results") or ())
+            file.write(
+                json.dumps(record, default=encode_value, separators=(",", ":")) + "\n"
+            )
+            count += 1
+    return count
+
+
+def _csv_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def export_csv(results, summary_path, tests_path):
+    """
+    Write the aggregated results and the per-test results as two CSV files.
+
+    Args:
+        results (iterable): Aggregated results returned by check_domain_health
+        summary_path (str): File for one row per domain
+        tests_path (str): File for one row per test
+
+    Returns:
+        int: Number of domains written
+    """
+    count = 0
+    with open(summary_path, "w", encoding="utf-8", newline="") as summary_file, open(
+        tests_path, "w", encoding="utf-8", newline=""
+    ) as tests_file:
+        summary_writer = csv.DictWriter(summary_file, SUMMARY_COLUMNS)
+        tests_writer = csv.DictWriter(tests_file, TEST_COLUMNS)
+        summary_writer.writeheader()
+        tests_writer.writeheader()
+
+        for result in results:
+            row = summary_row(result)
+            summary_writer.writerow({k: _csv_value(v) for k, v in row.items()})
+            for row in test_rows(result):
+                tests_writer.writerow({k: _csv_value(v) for k, v in row.items()})
+            count += 1
+    return count
+
+
+def export_parquet(results, summary_path, tests_path):
+    """
+    Write the aggregated results and the per-test results as two Parquet files.
+
+    Args:
+        results (iterable): Aggregated results returned by check_domain_health
+        summary_path (str): File for one row per domain
+        tests_path (str): File for one row per test
+
+    Returns:
+        int: Number of domains written
+
+    Raises:
+        ImportError: If no Parquet engine is installed for pandas
+    """
+    import pandas as pd
+
+    summary, tests = [], []
+    for result in results:
+        summary.append(summary_row(result))
+        tests.extend(test_rows(result))
+
+    for rows, columns, path in (
+        (summary, SUMMARY_COLUMNS, summary_path),
+        (tests, TEST_COLUMNS, tests_path),
+    ):
+        frame = pd.DataFrame(rows, columns=columns)
+        frame["ssl_expiry"] = pd.to_datetime(frame["ssl_expiry"])
+        frame.to_parquet(path, index=False)
+    return len(summary)
+
+
+def check_export_formats(formats):
+    """
+    Check that every export format is supported.
+
+    Raises:
+        ValueError: If a format is not one of EXPORT_FORMATS
+    """
+    for export_format in formats:
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(
+                f"Unknown export format '{export_format}', "
+                f"expected one of {EXPORT_FORMATS}"
+            )
+
+
+def export_results(results, formats, output_dir, name):
+    """
+    Export the results in each of the given formats.
+
+    Args:
+        results (iterable): Re-iterable aggregated results
+        formats (iterable): Formats out of EXPORT_FORMATS
+        output_dir (str): Directory to write the files to
+        name (str): Base name of the files, e.g. "export_20250101_120000"
+
+    Returns:
+        list: Paths of the files written
+    """
+    formats = list(formats)
+    check_export_formats(formats)
+
+    base = os.path.join(output_dir, name)
+    paths = []
+    if "jsonl" in formats:
+        export_jsonl(results, f"{base}.jsonl")
+        paths.append(f"{base}.jsonl")
+    for export_format, export in (("csv", export_csv), ("parquet", export_parquet)):
+        if export_format in formats:
+            summary_path = f"{base}_summary.{export_format}"
+            tests_path = f"{base}_tests.{export_format}"
+            export(results, summary_path, tests_path)
+            paths.extend([summary_path, tests_path])
+    return paths
@@ -0,0 +1,264 @@
+"""
+Historical results store.
+
+Keeps the aggregated and per-test results of every run in a SQLite file, so
+runs can be compared without re-parsing text reports. Both tables are indexed
+on (domain, run_at) and run_at, so trend and uptime queries only scan the
+index range they ask for as the history grows to millions of rows.
+"""
+
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+from domain_checker import percentile
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Length of the run_at prefix that identifies each trend bucket
+BUCKETS = {"hour": 13, "day": 10, "month": 7}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    run TEXT NOT NULL,
+    run_at TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    http_status TEXT,
+    https_status TEXT,
+    ssl_valid TEXT,
+    ssl_expiry TEXT,
+    days_until_expiry INTEGER,
+    http_success_rate REAL,
+    https_success_rate REAL,
+    ssl_success_rate REAL,
+    avg_http_response_time REAL,
+    avg_https_response_time REAL,
+    avg_dns_time REAL
+);
+CREATE INDEX IF NOT EXISTS results_domain_run_at ON results (domain, run_at);
+CREATE INDEX IF NOT EXISTS results_run_at ON results (run_at);
+CREATE INDEX IF NOT EXISTS results_run ON results (run);
+
+CREATE TABLE IF NOT EXISTS tests (
+    result_id INTEGER NOT NULL REFERENCES results (id) ON DELETE CASCADE,
+    run_at TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    http_status TEXT,
+    https_status TEXT,
+    ssl_valid TEXT,
+    http_response_time REAL,
+    https_response_time REAL,
+    dns_time REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS tests_domain_run_at ON tests (domain, run_at);
+CREATE INDEX IF NOT EXISTS tests_run_at ON tests (run_at);
+CREATE INDEX IF NOT EXISTS tests_result_id ON tests (result_id);
+"""
+
+RESULT_COLUMNS = (
+    "http_status",
+    "https_status",
+    "ssl_valid",
+    "ssl_expiry",
+    "days_until_expiry",
+    "http_success_rate",
+    "https_success_rate",
+    "ssl_success_rate",
+    "avg_http_response_time",
+    "avg_https_response_time",
+    "avg_dns_time",
+)
+
+TEST_COLUMNS = (
+    "http_status",
+    "https_status",
+    "ssl_valid",
+    "http_response_time",
+    "https_response_time",
+    "dns_time",
+    "error",
+)
+
+
+def format_time(value):
+    """Format a datetime the way it is stored, passing None through."""
+    return value.strftime(TIME_FORMAT) if isinstance(value, datetime) else value
+
+
+def since(days):
+    """Return the stored form of the time ``days`` days ago."""
+    return format_time(datetime.now() - timedelta(days=days))
+
+
+class HistoryStore:
+    """Results of past runs in a SQLite file."""
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): SQLite file to store the history in; created if missing
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        self._connection.executescript(SCHEMA)
+
+    def record_run(self, run, results, run_at=None):
+        """
+        Store the results of a run, replacing any stored earlier under its name.
+
+        Args:
+            run (str): Name identifying the run, e.g. its results file name
+            results (iterable): Aggregated results returned by
+                check_domain_health, with their ``test_results``
+            run_at (datetime): Time of the run (default: now)
+
+        Returns:
+            int: Number of domains stored
+        """
+        run_at = format_time(run_at or datetime.now())
+        count = 0
+
+        with self._connection:
+            self._connection.execute("DELETE FROM results WHERE run = ?", (run,))
+
+            for result in results:
+                cursor = self._connection.execute(
+                    f"INSERT INTO results (run, run_at, domain, "
+                    f"{', '.join(RESULT_COLUMNS)}) "
+                    f"VALUES (?, ?, ?{', ?' * len(RESULT_COLUMNS)})",
+                    (run, run_at, result["domain"])
+                    + tuple(format_time(result.get(c)) for c in RESULT_COLUMNS),
+                )
+                self._connection.executemany(
+                    f"INSERT INTO tests (result_id, run_at, domain, "
+                    f"{', '.join(TEST_COLUMNS)}) "
+                    f"VALUES (?, ?, ?{', ?' * len(TEST_COLUMNS)})",
+                    (
+                        (cursor.lastrowid, run_at, result["domain"])
+                        + tuple(test.get(c) for c in TEST_COLUMNS)
+                        for test in result.get("test_results", ())
+                    ),
+                )
+                count += 1
+
+        return count
+
+    def latency_trend(self, domain, protocol="https", days=30, bucket="day"):
+        """
+        Get the latency percentiles of a domain over time.
+
+        Args:
+            domain (str): Domain to query
+            protocol (str): "http" or "https"
+            days (int): Number of days to look back
+            bucket (str): "hour", "day" or "month"
+
+        Returns:
+            list: One dict per bucket with "period", "count", "p50" and "p95"
+            response times in seconds, oldest first
+        """
+        if protocol not in ("http", "https"):
+            raise ValueError(f"Unknown protocol '{protocol}'")
+        if bucket not in BUCKETS:
+            raise ValueError(
+                f"Unknown bucket '{bucket}', expected one of {tuple(BUCKETS)}"
+            )
+
+        rows = self._connection.execute(
+            f"SELECT substr(run_at, 1, ?) AS period, {protocol}_response_time "
+            f"FROM tests WHERE domain = ? AND run_at >= ? "
+            f"AND {protocol}_response_time IS NOT NULL ORDER BY period",
+            (BUCKETS[bucket], domain, since(days)),
+        )
+
+        trend = []
+        period, times = None, []
+        for row_period, value in rows:
+            if row_period != period and times:
+                trend.append(self._trend_point(period, times))
+                times = []
+            period = row_period
+            times.append(value)
+        if times:
+            trend.append(self._trend_point(period, times))
+        return trend
+
+    @staticmethod
+    def _trend_point(period, times):
+        return {
+            "period": period,
+            "count": len(times),
+            "p50": percentile(times, 50),
+            "p95": percentile(times, 95),
+        }
+
+    def uptime(self, days=30, domain=None, protocol="https"):
+        """
+        Get the share of successful tests per domain.
+
+        Args:
+            days (int): Number of days to look back
+            domain (str): Only query this domain (default: all domains)
+            protocol (str): "http" or "https"
+
+        Returns:
+            dict: Uptime percentage by domain
+        """
+        if protocol not in ("http", "https"):
+            raise ValueError(f"Unknown protocol '{protocol}'")
+
+        query = (
+            f"SELECT domain, AVG({protocol}_status LIKE 'OK%') * 100 "
+            f"FROM tests WHERE run_at >= ?"
+        )
+        params = [since(days)]
+        if domain is not None:
+            query += " AND domain = ?"
+            params.append(domain)
+        query += " GROUP BY domain"
+
+        return dict(self._connection.execute(query, params))
+
+    def expiry_projection(self, days=30):
+        """
+        Get the domains whose latest certificate expires within ``days`` days.
+
+        Returns:
+            list: Dicts with "domain", "ssl_expiry" and "days_remaining" as of
+            now, soonest first
+        """
+        # With MAX(), SQLite takes the other columns from the latest row
+        rows = self._connection.execute(
+            "SELECT domain, ssl_expiry, MAX(run_at) FROM results GROUP BY domain "
+            "HAVING ssl_expiry IS NOT NULL AND ssl_expiry <= ? ORDER BY ssl_expiry",
+            (format_time(datetime.now() + timedelta(days=days)),),
+        )
+
+        now = datetime.now()
+        projection = []
+        for domain, ssl_expiry, _ in rows:
+            expiry = datetime.strptime(ssl_expiry, TIME_FORMAT)
+            projection.append(
+                {
+                    "domain": domain,
+                    "ssl_expiry": expiry,
+                    "days_remaining": (expiry - now).days,
+                }
+            )
+        return projection
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,630 @@
+"""
+Low-level HTTP(S) probe.
+
+Issues requests with ``http.client`` over sockets opened by this module, so a
+probe has direct access to the TLS connection that served it. In particular,
+the peer certificate of an HTTPS probe is read from the same handshake that
+carried the request, instead of opening a second connection for it.
+
+Connections can be kept alive in a ``ConnectionPool`` and reused by later
+requests to the same host, which separates warm-connection latency from the
+cost of DNS, TCP and TLS setup.
+
+Every request records a breakdown of its time per phase (see ``PHASES``),
+measured with the monotonic clock, and the number of response bytes it read.
+Requests accept gzip and deflate like a browser; bodies are never decoded,
+so the bytes counted are the compressed bytes transferred.
+Redirects are followed hop by hop, and each hop is recorded with its URL,
+status code and latency.
+
+Connecting (TCP connect and TLS handshake) and reading have separate
+timeouts. A request can also be given a deadline: DNS resolution gives up
+when it passes, and bodies are read in chunks, each with its socket timeout
+capped to the time left, so neither a blackholed host nor one dripping its
+body can outlast it by much.
+
+Probes do not need the page itself, so the body can be skipped (see
+``BODY_MODES``): a HEAD request, or a GET closed right after the status line
+and headers, transfers a few hundred bytes instead of the whole page.
+"""
+
+import http.client
+import socket
+import ssl
+import threading
+import time
+from urllib.parse import urljoin, urlsplit
+
+from dns_cache import get_dns_cache, resolve
+
+MAX_REDIRECTS = 30
+REDIRECT_STATUS_CODES = (301, 302, 303, 307, 308)
+USER_AGENT = "domain-health-checker"
+
+# Phases of a request: DNS lookup, TCP connect, TLS handshake, time to first
+# byte (request sent until response headers are read) and body download
+PHASES = ("dns", "connect", "tls", "ttfb", "body")
+
+# How much of each response to download: "full" reads the whole body, "head"
+# sends HEAD requests, "headers" closes a GET after the status line and
+# headers, and "capped" reads at most body_limit bytes of the body
+BODY_MODES = ("full", "head", "headers", "capped")
+DEFAULT_BODY_MODE = "full"
+DEFAULT_BODY_LIMIT = 16384
+
+# Seconds to wait for a connection (TCP connect and TLS handshake), and for
+# each read of a response
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 10
+
+# Bytes of a body read per socket read; the deadline is checked between reads
+BODY_CHUNK_SIZE = 65536
+
+# A socket timeout capped to the time left can fire slightly before the
+# deadline; timeouts this close to it are counted as deadline cuts
+DEADLINE_SLACK = 0.05
+
+# Status codes of servers that do not support HEAD; the hop is sent again as a
+# GET closed after its headers
+HEAD_UNSUPPORTED_STATUS_CODES = (405, 501)
+
+
+def create_ssl_context():
+    """Create the SSL context used to verify certificates."""
+    try:
+        import certifi
+
+        return ssl.create_default_context(cafile=certifi.where())
+    except Exception:
+        # Fallback to the system certificate store if certifi is not available
+        return ssl.create_default_context()
+
+
+_ssl_context = None
+
+
+def get_ssl_context():
+    """Return the shared SSL context, creating it on first use."""
+    global _ssl_context
+    if _ssl_context is None:
+        _ssl_context = create_ssl_context()
+    return _ssl_context
+
+
+class DeadlineExceeded(TimeoutError):
+    """A request was cut short because its deadline passed."""
+
+
+def time_left(deadline):
+    """
+    Get the seconds left before a time.monotonic() deadline.
+
+    Returns:
+        float: Seconds left, or None without a deadline
+
+    Raises:
+        DeadlineExceeded: If the deadline has passed
+    """
+    if deadline is None:
+        return None
+
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded("Time budget exceeded")
+    return left
+
+
+def new_timings():
+    """Return a timing breakdown with every phase set to zero."""
+    return dict.fromkeys(PHASES, 0.0)
+
+
+def resolve_within(hostname, port, timeout):
+    """
+    Resolve a host, giving up after a timeout.
+
+    Hosts in the DNS cache are answered directly. Other lookups run in a
+    daemon thread, since getaddrinfo cannot be interrupted; one that times
+    out keeps running in the background and still fills the cache.
+
+    Returns:
+        list: (family, type, proto, sockaddr) tuples
+
+    Raises:
+        TimeoutError: If the lookup did not finish within the timeout
+    """
+    dns_cache = get_dns_cache()
+    if dns_cache is not None:
+        addresses = dns_cache.cached(hostname, port)
+        if addresses is not None:
+            return addresses
+
+    outcome = {}
+
+    def lookup():
+        try:
+            outcome["addresses"] = resolve(hostname, port)
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=lookup, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        raise TimeoutError(f"DNS resolution of {hostname} timed out")
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["addresses"]
+
+
+def connect(addresses, timeout):
+    """
+    Connect to the first reachable address, like socket.create_connection.
+
+    Returns:
+        socket.socket: Connected socket
+    """
+    error = None
+    for family, type_, proto, sockaddr in addresses:
+        sock = socket.socket(family, type_, proto)
+        try:
+            sock.settimeout(timeout)
+            sock.connect(sockaddr)
+            return sock
+        except OSError as e:
+            error = e
+            sock.close()
+
+    raise error or OSError("getaddrinfo returns an empty list")
+
+
+def open_connection(
+    scheme, hostname, port, timeout=10, timings=None, connect_timeout=None
+):
+    """
+    Open a connection to a host, performing the TLS handshake for HTTPS.
+
+    Args:
+        scheme (str): "http" or "https"
+        hostname (str): Host to connect to
+        port (int): Port to connect to
+        timeout (float): Socket timeout in seconds for reads
+        timings (dict): Optional breakdown to add the "dns", "connect" and
+            "tls" phase durations to
+        connect_timeout (float): Timeout in seconds of the DNS lookup, the
+            TCP connect and the TLS handshake (default: timeout)
+
+    Returns:
+        http.client.HTTPConnection: Connected HTTP connection
+    """
+    if timings is None:
+        timings = new_timings()
+
+    if connect_timeout is None:
+        connect_timeout = timeout
+
+    phase_start = time.monotonic()
+    addresses = resolve_within(hostname, port, connect_timeout)
+    timings["dns"] += time.monotonic() - phase_start
+
+    phase_start = time.monotonic()
+    sock = connect(addresses, connect_timeout)
+    timings["connect"] += time.monotonic() - phase_start
+
+    try:
+        if scheme == "https":
+            phase_start = time.monotonic()
+            sock = get_ssl_context().wrap_socket(sock, server_hostname=hostname)
+            timings["tls"] += time.monotonic() - phase_start
+        sock.settimeout(timeout)
+    except Exception:
+        sock.close()
+        raise
+
+    connection = http.client.HTTPConnection(hostname, port, timeout=timeout)
+    connection.sock = sock
+    return connection
+
+
+class ConnectionPool:
+    """Idle keep-alive connections, keyed by (scheme, hostname, port)."""
+
+    def __init__(self):
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Take an idle connection for a key, or None if there is none."""
+        with self._lock:
+            connections = self._idle.get(key)
+            if connections:
+                return connections.pop()
+        return None
+
+    def put(self, key, connection):
+        """Return a connection to the pool for later reuse."""
+        with self._lock:
+            self._idle.setdefault(key, []).append(connection)
+
+    def close(self):
+        """Close all idle connections."""
+        with self._lock:
+            for connections in self._idle.values():
+                for connection in connections:
+                    connection.close()
+            self._idle.clear()
+
+
+def body_request(body_mode=DEFAULT_BODY_MODE, body_limit=DEFAULT_BODY_LIMIT):
+    """
+    Get the request method and body limit of a body mode.
+
+    Args:
+        body_mode (str): One of BODY_MODES
+        body_limit (int): Maximum body bytes read in "capped" mode
+
+    Returns:
+        tuple: (method, body_limit), where body_limit is None to read the
+        whole body and 0 to read none of it
+    """
+    if body_mode not in BODY_MODES:
+        raise ValueError(
+            f"Unknown body mode '{body_mode}', expected one of {BODY_MODES}"
+        )
+    if body_mode == "head":
+        return "HEAD", None
+    if body_mode == "headers":
+        return "GET", 0
+    if body_mode == "capped":
+        return "GET", max(0, int(body_limit))
+    return "GET", None
+
+
+def header_size(response):
+    """Number of bytes of a response's status line and headers."""
+    size = len(f"HTTP/1.1 {response.status} {response.reason}\r\n") + 2
+    for name, value in response.msg.items():
+        size += len(name) + len(value) + 4
+    return size
+
+
+def read_body(response, sock, timeout, body_limit=None, deadline=None):
+    """
+    Read a response body in chunks, stopping at a deadline.
+
+    Before each socket read, the socket timeout is capped to the time left,
+    so a server sending its body slowly cannot keep the read going past the
+    deadline.
+
+    Args:
+        response (http.client.HTTPResponse): Response to read
+        sock (socket.socket): Socket the response is read from
+        timeout (float): Timeout in seconds of each socket read
+        body_limit (int): Maximum number of bytes to read, or None to read
+            the whole body
+        deadline (float): Optional time.monotonic() time to stop by
+
+    Returns:
+        int: Number of body bytes read
+
+    Raises:
+        DeadlineExceeded: If the deadline passed before the body was read
+    """
+    received = 0
+    chunk = b""
+    while body_limit is None or received < body_limit:
+        left = time_left(deadline)
+        if sock is not None and left is not None:
+            sock.settimeout(min(timeout, left))
+
+        size = BODY_CHUNK_SIZE
+        if body_limit is not None:
+            size = min(size, body_limit - received)
+        chunk = response.read1(size)
+        if not chunk:
+            break
+        received += len(chunk)
+
+    # read1 leaves a finished (or HEAD) response open; read marks it closed
+    # without reading more, so its connection can be reused
+    if not chunk or response.length == 0:
+        response.read()
+    return received
+
+
+def send_request(
+    connection,
+    hostname,
+    path,
+    method="GET",
+    keep_alive=False,
+    timings=None,
+    body_limit=None,
+    deadline=None,
+):
+    """
+    Send a request on an open connection and read the response.
+
+    Adds the "ttfb" and "body" phase durations to ``timings`` if given. A
+    response whose body was not read completely is left open; its connection
+    cannot be reused and must be closed.
+
+    Args:
+        body_limit (int): Maximum number of body bytes to read, 0 to read
+            none, or None to read the whole body
+        deadline (float): Optional time.monotonic() time by which the body
+            must be read, see read_body
+
+    Returns:
+        tuple: (response, received), where received is the number of bytes
+        of the status line, headers and body that were read
+    """
+    if timings is None:
+        timings = new_timings()
+
+    # http.client detaches the socket of a response the server will close
+    sock = connection.sock
+
+    phase_start = time.monotonic()
+    connection.request(
+        method,
+        path,
+        headers={
+            "Host": hostname,
+            "User-Agent": USER_AGENT,
+            "Accept": "*/*",
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive" if keep_alive else "close",
+        },
+    )
+    response = connection.getresponse()
+    timings["ttfb"] += time.monotonic() - phase_start
+
+    phase_start = time.monotonic()
+    received = 0
+    if body_limit != 0:
+        received = read_body(
+            response, sock, sock.gettimeout(), body_limit, deadline
+        )
+    timings["body"] += time.monotonic() - phase_start
+    return response, header_size(response) + received
+
+
+def peer_certificate(connection):
+    """
+    Get the peer certificate of a connection.
+
+    Returns:
+        tuple: (certificate dict, DER-encoded certificate), or None for plain
+        HTTP
+    """
+    if isinstance(connection.sock, ssl.SSLSocket):
+        return connection.sock.getpeercert(), connection.sock.getpeercert(True)
+    return None
+
+
+def request(
+    key,
+    netloc,
+    path,
+    method,
+    timeout,
+    pool=None,
+    timings=None,
+    body_limit=None,
+    connect_timeout=None,
+    deadline=None,
+):
+    """
+    Send a request, on a pooled connection if one is idle.
+
+    The peer certificate is read before the response, since http.client
+    detaches the socket from connections the server is about to close. A
+    reused connection that the server already closed is replaced by a new one
+    and the request is sent again. Phase durations are added to ``timings``;
+    ``timeout`` applies to reads and ``connect_timeout`` to new connections,
+    and the body is read by ``deadline`` if given.
+
+    Returns:
+        tuple: (connection, response, peercert, reused, received), where
+        peercert is returned by peer_certificate and received is returned by
+        send_request
+    """
+    scheme, hostname, port = key
+    keep_alive = pool is not None
+    connection = pool.get(key) if pool else None
+
+    if connection is not None:
+        try:
+            connection.sock.settimeout(timeout)
+            peercert = peer_certificate(connection)
+            response, received = send_request(
+                connection,
+                netloc,
+                path,
+                method,
+                keep_alive,
+                timings,
+                body_limit,
+                deadline,
+            )
+            return connection, response, peercert, True, received
+        except (http.client.HTTPException, OSError):
+            connection.close()
+
+    connection = open_connection(
+        scheme, hostname, port, timeout, timings, connect_timeout
+    )
+    try:
+        peercert = peer_certificate(connection)
+        response, received = send_request(
+            connection,
+            netloc,
+            path,
+            method,
+            keep_alive,
+            timings,
+            body_limit,
+            deadline,
+        )
+    except Exception:
+        connection.close()
+        raise
+    return connection, response, peercert, False, received
+
+
+def capped_timeouts(timeout, connect_timeout, deadline=None):
+    """
+    Cap read and connect timeouts to the time left before a deadline.
+
+    Returns:
+        tuple: (timeout, connect_timeout)
+
+    Raises:
+        DeadlineExceeded: If the deadline has passed
+    """
+    left = time_left(deadline)
+    if left is None:
+        return timeout, connect_timeout
+    return min(timeout, left), min(connect_timeout, left)
+
+
+def fetch(
+    url,
+    timeout=DEFAULT_READ_TIMEOUT,
+    method="GET",
+    pool=None,
+    body_limit=None,
+    connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+    deadline=None,
+):
+    """
+    Request a URL, following redirects.
+
+    Args:
+        url (str): URL to request
+        timeout (float): Timeout in seconds of each read
+        method (str): HTTP method to use; a HEAD request the server does not
+            support is sent again as a GET closed after its headers
+        pool (ConnectionPool): Optional pool to take connections from and
+            return them to; without it every connection is closed after use
+        body_limit (int): Maximum number of body bytes to read per response,
+            0 to read none, or None to read whole bodies (see body_request)
+        connect_timeout (float): Timeout in seconds of each TCP connect and
+            TLS handshake
+        deadline (float): Optional time.monotonic() time by which the request
+            must be done; every hop's timeouts are capped to the time left
+
+    Raises:
+        DeadlineExceeded: If the deadline passed before the request was done
+    Returns:
+        dict: "status_code" and "url" of the final response, "elapsed" time
+        in seconds for the whole request, "peercert" of the first HTTPS
+        connection and its DER encoding "peercert_der" (None for plain
+        HTTP), whether the first connection was
+        "reused" from the pool, the "timings" of each phase in seconds and
+        the "bytes_received", both summed over all redirect hops, and the
+        "hops" followed, as dicts with their "url", "status_code" and
+        "elapsed" time, the final response last
+    """
+    start_time = time.monotonic()
+    timings = new_timings()
+    peercert = None
+    reused = None
+    bytes_received = 0
+    hops = []
+
+    try:
+        for _ in range(MAX_REDIRECTS + 1):
+            hop_start = time.monotonic()
+            parts = urlsplit(url)
+            scheme = parts.scheme.lower()
+            hostname = parts.hostname
+            port = parts.port or (443 if scheme == "https" else 80)
+            path = parts.path or "/"
+            if parts.query:
+                path += f"?{parts.query}"
+
+            key = (scheme, hostname, port)
+            read_timeout, hop_connect_timeout = capped_timeouts(
+                timeout, connect_timeout, deadline
+            )
+            connection, response, hop_peercert, hop_reused, received = request(
+                key,
+                parts.netloc,
+                path,
+                method,
+                read_timeout,
+                pool=pool,
+                timings=timings,
+                body_limit=body_limit,
+                connect_timeout=hop_connect_timeout,
+                deadline=deadline,
+            )
+
+            if method == "HEAD" and response.status in HEAD_UNSUPPORTED_STATUS_CODES:
+                connection.close()
+                bytes_received += received
+                method, body_limit = "GET", 0
+                read_timeout, hop_connect_timeout = capped_timeouts(
+                    timeout, connect_timeout, deadline
+                )
+                connection, response, hop_peercert, hop_reused, received = request(
+                    key,
+                    parts.netloc,
+                    path,
+                    method,
+                    read_timeout,
+                    pool=pool,
+                    timings=timings,
+                    body_limit=body_limit,
+                    connect_timeout=hop_connect_timeout,
+                    deadline=deadline,
+                )
+            bytes_received += received
+
+            # A connection is only reusable once its response was read completely
+            if pool is None or response.will_close or not response.isclosed():
+                connection.close()
+            else:
+                pool.put(key, connection)
+
+            if reused is None:
+                reused = hop_reused
+            if peercert is None:
+                peercert = hop_peercert
+            hops.append(
+                {
+                    "url": url,
+                    "status_code": response.status,
+                    "elapsed": time.monotonic() - hop_start,
+                }
+            )
+
+            location = response.getheader("Location")
+            if response.status not in REDIRECT_STATUS_CODES or not location:
+                break
+
+            url = urljoin(url, location)
+            # A 303 turns other methods into GET; HEAD stays HEAD
+            if response.status == 303 and method != "HEAD":
+                method = "GET"
+        else:
+            raise http.client.HTTPException(f"Exceeded {MAX_REDIRECTS} redirects")
+    except TimeoutError as e:
+        # Timeouts capped to the time left are cuts of the deadline
+        if deadline is not None and time.monotonic() >= deadline - DEADLINE_SLACK:
+            raise DeadlineExceeded("Time budget exceeded") from e
+        raise
+
+    return {
+        "status_code": response.status,
+        "url": url,
+        "elapsed": time.monotonic() - start_time,
+        "peercert": peercert[0] if peercert else None,
+        "peercert_der": peercert[1] if peercert else None,
+        "reused": reused,
+        "timings": timings,
+        "bytes_received": bytes_received,
+        "hops": hops,
+    }
@@ -6,26 +6,181 @@ This script checks domain health by testing HTTP/HTTPS status and SSL certificat
 It performs multiple tests on each domain and generates both visual and text reports.
 """
 
+import argparse
 import sys
 import os
+import time
+from array import array
 from datetime import datetime
 import pytz
 import dotenv
 
 # Import modules
-from domain_checker import check_domain_health, read_domains_from_file
-from visualization import generate_plots, generate_text_report
-from visualization.utils import get_korean_time
+from domain_checker import (
+    DEFAULT_CERT_MODE,
+    DEFAULT_TEST_INTERVAL,
+    DEFAULT_TEST_JITTER,
+)
+from cert_cache import CertificateCache
+from circuit_breaker import DEFAULT_MAX_COOLDOWN_HOURS, BreakerStore
+from dns_cache import DNSCache
+from http_probe import (
+    DEFAULT_BODY_LIMIT,
+    DEFAULT_BODY_MODE,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_READ_TIMEOUT,
+)
+from history_store import HistoryStore
+from domain_list import DEFAULT_DEDUP_CAPACITY, iter_targets
+from exporters import check_export_formats, export_results
+from probe_engine import ProbeEngine, print_progress
+from result_sink import (
+    ResultReader,
+    ResultSink,
+    completed_domains,
+    find_resumable,
+)
+from sharding import run_sharded
+import visualization
+from visualization.text_report import REPORT_MODES
+from visualization.utils import IMAGE_FORMATS, get_korean_time
 
 
-def main():
+def env_flag(name, default=False):
+    """Read a true/false setting from an environment variable."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def parse_args(argv=None):
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Domain Health Checker")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        default=env_flag("RESUME"),
+        help="continue the latest interrupted run, probing only the domains "
+        "that have no result yet",
+    )
+    parser.add_argument(
+        "--no-plots",
+        action="store_true",
+        default=not env_flag("PLOTS", True),
+        help="skip the charts; the plotting libraries are never imported",
+    )
+    parser.add_argument(
+        "--json-only",
+        action="store_true",
+        default=env_flag("JSON_ONLY"),
+        help="only write the JSON Lines results file and the history, "
+        "without charts or text report",
+    )
+    return parser.parse_args(argv)
+
+
+def skip_completed(domains, completed, positions):
+    """
+    Yield the domains without a result yet, recording their list positions.
+
+    Args:
+        domains (iterable): Targets read from the domain list
+        completed (set): Domains that already have a result
+        positions (array): Receives the list position of each yielded domain
+    """
+    for position, target in enumerate(domains):
+        if target.domain in completed:
+            continue
+        positions.append(position)
+        yield target
+
+
+def main(argv=None):
     """Main function to run the domain health checker."""
     # Load environment variables
     dotenv.load_dotenv()
+    args = parse_args(argv)
 
     # Get test count from environment variable or use default
     test_count = int(os.getenv("TEST_COUNT", 5))
 
+    # Adaptive sampling: run at least MIN_TEST_COUNT tests, and up to
+    # TEST_COUNT only while the results are not settled
+    min_test_count = os.getenv("MIN_TEST_COUNT")
+    min_test_count = int(min_test_count) if min_test_count else None
+    latency_cv = float(os.getenv("LATENCY_CV", 0))
+
+    # Get concurrency limits from environment variables or use defaults
+    max_concurrency = int(os.getenv("MAX_CONCURRENCY", 50))
+    per_host_concurrency = int(os.getenv("PER_HOST_CONCURRENCY", 1))
+
+    # Get spacing between tests of the same host, with random jitter
+    test_interval = float(os.getenv("TEST_INTERVAL", DEFAULT_TEST_INTERVAL))
+    test_jitter = float(os.getenv("TEST_JITTER", DEFAULT_TEST_JITTER))
+
+    # Number of worker processes to split the domain list across
+    shards = int(os.getenv("SHARDS", 1))
+
+    # Get certificate mode from environment variable or use default
+    cert_mode = os.getenv("CERT_MODE", DEFAULT_CERT_MODE)
+
+    # Timeouts of each connection and read, wall-clock budget of each domain
+    # and deadline of the whole run, in seconds (0 = no limit)
+    connect_timeout = float(os.getenv("CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT))
+    read_timeout = float(os.getenv("READ_TIMEOUT", DEFAULT_READ_TIMEOUT))
+    domain_budget = float(os.getenv("DOMAIN_BUDGET", 0)) or None
+    run_deadline = float(os.getenv("RUN_DEADLINE", 0))
+    deadline = time.time() + run_deadline if run_deadline else None
+
+    # Skip a domain's remaining tests after a definitive failure, and keep it
+    # in a cooldown across runs for this many hours (0 = only within a run)
+    circuit_breaker = env_flag("CIRCUIT_BREAKER", True)
+    breaker_cooldown = float(os.getenv("BREAKER_COOLDOWN_HOURS", 0))
+    breaker_max_cooldown = float(
+        os.getenv("BREAKER_MAX_COOLDOWN_HOURS", DEFAULT_MAX_COOLDOWN_HOURS)
+    )
+
+    # How much of each response to download, and the body limit of the
+    # "capped" mode
+    body_mode = os.getenv("BODY_MODE", DEFAULT_BODY_MODE).lower()
+    body_limit = int(os.getenv("BODY_LIMIT", DEFAULT_BODY_LIMIT))
+
+    # Request redirect targets directly once known, and keep every redirect
+    # hop of every test
+    cache_redirects = env_flag("REDIRECT_CACHE")
+    record_hops = env_flag("RECORD_REDIRECTS")
+
+    # Keep certificates on disk between runs, to report the ones replaced
+    # since the previous run
+    use_cert_cache = env_flag("CERT_CACHE")
+
+    # Get DNS cache settings from environment variables or use defaults
+    use_dns_cache = env_flag("DNS_CACHE", True)
+    dns_cache_ttl = float(os.getenv("DNS_CACHE_TTL", 300))
+    dns_cache_size = int(os.getenv("DNS_CACHE_SIZE", 10000))
+    prefetch_dns = env_flag("DNS_PREFETCH", True)
+
+    # Break response times down by request phase in the reports
+    show_phases = env_flag("SHOW_PHASES")
+
+    # Resolution, file format and rendering processes of the charts
+    plot_dpi = int(os.getenv("PLOT_DPI", 300))
+    plot_format = os.getenv("PLOT_FORMAT", "png").lower()
+    plot_workers = int(os.getenv("PLOT_WORKERS", 0)) or None
+
+    # Above this many domains, chart distributions instead of every domain
+    large_scale_threshold = int(os.getenv("PLOT_LARGE_SCALE_THRESHOLD", 300))
+
+    # Domains per image of the detail charts
+    detail_page_size = int(os.getenv("PLOT_DETAIL_PAGE_SIZE", 100))
+
+    # Layout of the text report: full, compact or failures
+    report_mode = os.getenv("REPORT_MODE", "full").lower()
+
+    # Keep connections alive between the tests of a domain
+    reuse_connections = env_flag("REUSE_CONNECTIONS")
+
     # Display header
     print("===== Domain Health Checker =====")
 
@@ -33,8 +188,34 @@ def main():
     current_time = get_korean_time()
     print(f"Current time (KST): {current_time}")
 
-    # Set default values
-    file_path = "domains.txt"  # Default file to read domains from
+    # Get the domain list file (plain text or gzip) from environment variable
+    file_path = os.getenv("DOMAINS_FILE", "domains.txt")
+    dedup_capacity = int(os.getenv("DEDUP_CAPACITY", DEFAULT_DEDUP_CAPACITY))
+
+    # Directory for result files and images
+    output_dir = os.getenv("OUTPUT_DIR", "results")
+
+    # Keep the results of every run in a history database
+    keep_history = env_flag("HISTORY", True)
+
+    # Machine-readable exports to write: jsonl, csv and/or parquet
+    export_formats = [
+        export_format.strip().lower()
+        for export_format in os.getenv("EXPORT_FORMATS", "").split(",")
+        if export_format.strip()
+    ]
+    try:
+        check_export_formats(export_formats)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+
+    if report_mode not in REPORT_MODES:
+        print(f"Error: Unknown report mode '{report_mode}', expected one of {REPORT_MODES}")
+        return 1
+    if plot_format not in IMAGE_FORMATS:
+        print(f"Error: Unknown image format '{plot_format}', expected one of {IMAGE_FORMATS}")
+        return 1
 
     try:
         # Check if the domains file exists
@@ -45,18 +226,156 @@ def main():
             )
             return 1
 
-        # Read domains from file
-        domains = read_domains_from_file(file_path)
-        print(f"Loaded {len(domains)} domains from '{file_path}'.")
+        # Stream domains from file; probing starts while it is being read
+        domains = iter_targets(file_path, dedup_capacity=dedup_capacity)
+        print(f"Reading domains from '{file_path}'.")
         print(f"Test count: {test_count}")
+        print(f"Concurrency: {max_concurrency} (per host: {per_host_concurrency})")
 
-        # Check each domain
-        results = []
+        # Check all domains concurrently
+        engine_options = dict(
+            max_concurrency=max_concurrency,
+            per_host_concurrency=per_host_concurrency,
+            test_interval=test_interval,
+            test_jitter=test_jitter,
+            cert_mode=cert_mode,
+            reuse_connections=reuse_connections,
+            dns_cache=(
+                DNSCache(default_ttl=dns_cache_ttl, max_entries=dns_cache_size)
+                if use_dns_cache
+                else None
+            ),
+            prefetch_dns=prefetch_dns,
+            body_mode=body_mode,
+            body_limit=body_limit,
+            cache_redirects=cache_redirects,
+            record_hops=record_hops,
+            min_test_count=min_test_count,
+            latency_cv=latency_cv,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            domain_budget=domain_budget,
+            deadline=deadline,
+            circuit_breaker=circuit_breaker,
+            breaker_store=(
+                BreakerStore(
+                    os.path.join(output_dir, "circuit_breaker.sqlite"),
+                    cooldown_hours=breaker_cooldown,
+                    max_cooldown_hours=breaker_max_cooldown,
+                )
+                if circuit_breaker and breaker_cooldown
+                else None
+            ),
+            cert_cache=(
+                CertificateCache(os.path.join(output_dir, "cert_cache.sqlite"))
+                if use_cert_cache
+                else None
+            ),
+        )
+
+        # Write each domain's result to disk as soon as it completes
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        results_file = os.path.join(output_dir, f"results_{timestamp}.jsonl")
+
+        # Skip the domains an interrupted run already has results for
+        positions = array("q")
+        resumable = find_resumable(output_dir) if args.resume else None
+        if resumable:
+            results_file = resumable
+            completed = completed_domains(results_file)
+            print(f"Resuming '{results_file}' ({len(completed)} domains done).")
+            domains = skip_completed(domains, completed, positions)
+        elif args.resume:
+            print("No interrupted run to resume, starting a new run.")
+
+        progress = print_progress()
+
+        with ResultSink(results_file) as sink:
+
+            def on_result(index, result):
+                # Store results by their position in the full domain list
+                if resumable:
+                    index = positions[index]
+                sink.write(index, result)
+                progress(index, result)
+
+            if shards > 1:
+                print(f"Shards: {shards} worker processes")
+                run_sharded(
+                    domains,
+                    shards,
+                    engine_options,
+                    test_count=test_count,
+                    on_result=on_result,
+                    collect_results=False,
+                )
+            else:
+                ProbeEngine(**engine_options).run(
+                    domains,
+                    test_count=test_count,
+                    on_result=on_result,
+                    collect_results=False,
+                )
+
+            # A run stopped by its deadline stays resumable
+            if deadline is not None and time.time() >= deadline:
+                print(
+                    "Run deadline reached; use --resume to check the "
+                    "remaining domains."
+                )
+            else:
+                sink.mark_complete()
+
+        for store in ("cert_cache", "breaker_store"):
+            if engine_options[store] is not None:
+                engine_options[store].close()
+
+        print(f"Checked {sink.count} domains, results saved in '{results_file}'.")
+
+        # Later stages read the results back from disk
+        results = ResultReader(results_file)
+
+        # Nothing to chart or report if the deadline passed before any domain
+        if not len(results):
+            print("No domains completed before the deadline, skipping the reports.")
+            print("=" * 40)
+            return 0
+
+        run = os.path.splitext(os.path.basename(results_file))[0]
+        if keep_history:
+            run_at = datetime.strptime(run, "results_%Y%m%d_%H%M%S")
+            with HistoryStore(os.path.join(output_dir, "history.sqlite")) as history:
+                history.record_run(run, results, run_at)
+            print(f"Results added to the history in '{history.path}'.")
+
+        # Export the results for other tools, one format at a time so a
+        # missing Parquet engine does not prevent the other exports
+        for export_format in export_formats:
+            try:
+                paths = export_results(
+                    results,
+                    [export_format],
+                    output_dir,
+                    run.replace("results_", "export_", 1),
+                )
+            except ImportError as e:
+                print(f"Skipping the {export_format} export: {e}")
+                continue
+            print(f"Results exported to {', '.join(repr(p) for p in paths)}.")
         domains_with_expiring_certs = []
+        domains_with_changed_certs = []
+        bytes_received = 0
+        tests_run = 0
+
+        for result in results:
+            tests_run += len(result.get("test_results") or ())
+            domain = result["domain"]
+            bytes_received += result.get("http_bytes_received", 0)
+            bytes_received += result.get("https_bytes_received", 0)
 
-        for i, domain in enumerate(domains, 1):
-            print(f"[{i}/{len(domains)}] Checking {domain}... ({test_count} tests)")
-            result = check_domain_health(domain, test_count=test_count)
+            # Check for certificates replaced since the previous run
+            if result.get("certificate_change"):
+                domains_with_changed_certs.append((domain, result["certificate_change"]))
 
             # Check for domains with expiring SSL certificates
             if result["ssl_valid"] == "OK" and result.get("days_until_expiry", 0) <= 30:
@@ -76,15 +395,48 @@ def main():
                     }
                 )
 
-            results.append(result)
+        print(
+            f"Response bytes received ({body_mode} bodies): {bytes_received:,}"
+        )
+        if min_test_count is not None:
+            print(
+                f"Tests run: {tests_run} "
+                f"(adaptive, {min_test_count}-{test_count} per domain)"
+            )
 
-        # Generate visualizations
-        print("\nGenerating visualizations...")
-        stats = generate_plots(results)
+        if args.json_only:
+            print("\nJSON-only mode, skipping charts and text report.")
+        else:
+            if args.no_plots:
+                stats = visualization.summarize_results(
+                    ResultReader(results_file, include_tests=False)
+                )
+            else:
+                # Generate visualizations
+                print("\nGenerating visualizations...")
+                stats = visualization.generate_plots(
+                    ResultReader(results_file, include_tests=False),
+                    output_dir=output_dir,
+                    show_phases=show_phases,
+                    dpi=plot_dpi,
+                    image_format=plot_format,
+                    workers=plot_workers,
+                    large_scale_threshold=large_scale_threshold,
+                    detail_page_size=detail_page_size,
+                )
 
-        # Generate text report
-        print("Creating text report...")
-        report_file = generate_text_report(results, stats)
+            # Generate text report
+            print("Creating text report...")
+            report_file = visualization.generate_text_report(
+                (
+                    results
+                    if report_mode == "full"
+                    else ResultReader(results_file, include_tests=False)
+                ),
+                stats,
+                show_phases=show_phases,
+                mode=report_mode,
+            )
 
         # Print warning about expiring certificates
         if domains_with_expiring_certs:
@@ -107,8 +459,22 @@ def main():
                     print(f"{domain:<40} {days:<15} {expiry}")
             print("-" * 65)
 
+        # Print the certificates replaced since the previous run
+        if domains_with_changed_certs:
+            print("\nThe following domains have a new certificate since the last run:")
+            print("-" * 65)
+            print(f"{'DOMAIN':<40} {'ISSUER'}")
+            print("-" * 65)
+            for domain, change in domains_with_changed_certs:
+                if change["issuer"] != change["previous_issuer"]:
+                    issuer = f"{change['previous_issuer']} -> {change['issuer']} (new issuer)"
+                else:
+                    issuer = change["issuer"]
+                print(f"{domain:<40} {issuer}")
+            print("-" * 65)
+
         print("\nDomain health check completed!")
-        print(f"Results saved in the current directory.")
+        print(f"Results saved in '{output_dir}'.")
         print("=" * 40)
 
         return 0  # Success
@@ -0,0 +1,418 @@
+"""
+Concurrent probe engine.
+
+Runs the tests of many domains at the same time on top of asyncio. The
+blocking network calls of ``DomainProbe.run_test`` are executed in a thread
+pool, while the event loop enforces a global concurrency limit and a per-host
+limit. Tests of the same host are spaced by a jittered interval that only
+delays that host; other hosts keep probing while it waits.
+
+Each domain can have a wall-clock budget, and the run a global deadline.
+Once the deadline passes no new domain or test is started, requests in
+flight are cut short (see ``http_probe.fetch``), and domains keep the
+results of the tests they completed. Results are
+aggregated with ``aggregate_results`` so they have the same shape as the ones
+returned by ``check_domain_health``.
+"""
+
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from dns_cache import set_dns_cache
+from domain_checker import (
+    DEFAULT_CERT_MODE,
+    DEFAULT_TEST_INTERVAL,
+    DEFAULT_TEST_JITTER,
+    DomainProbe,
+    cooldown_result,
+    finish_results,
+    jittered_delay,
+    make_target,
+    sampling_settled,
+)
+from http_probe import (
+    DEFAULT_BODY_LIMIT,
+    DEFAULT_BODY_MODE,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_READ_TIMEOUT,
+)
+from records import TestSeries
+
+DEFAULT_MAX_CONCURRENCY = 50
+DEFAULT_PER_HOST_CONCURRENCY = 1
+
+# Domains in progress per global slot; most of them wait for their host's turn
+DOMAINS_PER_SLOT = 4
+
+# Domains read ahead of the probes to resolve their names in parallel
+DNS_PREFETCH_AHEAD = 1000
+
+
+class HostScheduler:
+    """
+    Space the tests of each host by a jittered interval without blocking.
+
+    Each host has its own next allowed start time. Waiting for it is an
+    ``asyncio.sleep``, so a politeness delay on one host never delays others.
+    """
+
+    def __init__(self, interval=DEFAULT_TEST_INTERVAL, jitter=DEFAULT_TEST_JITTER):
+        """
+        Args:
+            interval (float): Seconds between two tests of the same host
+            jitter (float): Maximum random deviation from the interval
+        """
+        self.interval = interval
+        self.jitter = jitter
+        self._next_start = {}
+
+    async def wait_turn(self, hostname):
+        """Wait until the host may be tested again and reserve that slot."""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        start = max(now, self._next_start.get(hostname, now))
+        self._next_start[hostname] = start + jittered_delay(self.interval, self.jitter)
+
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    def forget(self, hostname):
+        """Drop the state of a host that has no more tests to run."""
+        self._next_start.pop(hostname, None)
+
+    def test_done(self, hostname):
+        """Push the host's next start to one interval after this test ended."""
+        next_start = asyncio.get_running_loop().time() + jittered_delay(
+            self.interval, self.jitter
+        )
+        self._next_start[hostname] = max(
+            self._next_start.get(hostname, next_start), next_start
+        )
+
+
+class ProbeEngine:
+    """Probe many domains concurrently with global and per-host limits."""
+
+    def __init__(
+        self,
+        max_concurrency=DEFAULT_MAX_CONCURRENCY,
+        per_host_concurrency=DEFAULT_PER_HOST_CONCURRENCY,
+        test_interval=DEFAULT_TEST_INTERVAL,
+        test_jitter=DEFAULT_TEST_JITTER,
+        cert_mode=DEFAULT_CERT_MODE,
+        reuse_connections=False,
+        dns_cache=None,
+        prefetch_dns=False,
+        cert_cache=None,
+        body_mode=DEFAULT_BODY_MODE,
+        body_limit=DEFAULT_BODY_LIMIT,
+        cache_redirects=False,
+        record_hops=False,
+        min_test_count=None,
+        latency_cv=0.0,
+        connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+        read_timeout=DEFAULT_READ_TIMEOUT,
+        domain_budget=None,
+        deadline=None,
+        circuit_breaker=False,
+        breaker_store=None,
+    ):
+        """
+        Args:
+            max_concurrency (int): Maximum number of tests running at once
+            per_host_concurrency (int): Maximum number of tests running at once
+                against the same host
+            test_interval (float): Seconds to wait between two tests of the
+                same host, to avoid rate limiting
+            test_jitter (float): Maximum random deviation from test_interval
+            cert_mode (str): Certificate mode, see DomainProbe
+            reuse_connections (bool): Keep connections alive between the tests
+                of a domain
+            dns_cache (DNSCache): Optional DNS cache shared by all probes
+            prefetch_dns (bool): Resolve upcoming domains in parallel into the
+                DNS cache, ahead of the probes
+            cert_cache (CertificateCache): Optional persistent certificate
+                store shared by all probes, to detect replaced certificates
+            body_mode (str): How much of each response to download, see
+                http_probe.BODY_MODES
+            body_limit (int): Maximum body bytes read in "capped" mode
+            cache_redirects (bool): Request redirect targets directly once
+                known, see DomainProbe
+            record_hops (bool): Keep every redirect hop of every test
+            min_test_count (int): Run at least this many tests per domain,
+                then more only until the results are settled (see
+                sampling_settled); None always runs every test
+            latency_cv (float): Latency variation threshold, see
+                sampling_settled
+            connect_timeout (float): Seconds to wait for each TCP connect
+                and TLS handshake
+            read_timeout (float): Seconds to wait for each read of a response
+            domain_budget (float): Seconds of wall-clock time the tests of a
+                domain may take in total, from its first test, or None
+            deadline (float): Optional time.time() deadline of the run
+            circuit_breaker (bool): Skip a domain's remaining tests after a
+                definitive failure, see circuit_breaker.CircuitBreaker
+            breaker_store (BreakerStore): Optional store of cooldowns across
+                runs; domains in cooldown are not tested
+        """
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.per_host_concurrency = max(1, int(per_host_concurrency))
+        self.test_interval = test_interval
+        self.test_jitter = test_jitter
+        self.cert_mode = cert_mode
+        self.reuse_connections = reuse_connections
+        self.dns_cache = dns_cache
+        self.prefetch_dns = prefetch_dns
+        self.cert_cache = cert_cache
+        self.body_mode = body_mode
+        self.body_limit = body_limit
+        self.cache_redirects = cache_redirects
+        self.record_hops = record_hops
+        self.min_test_count = min_test_count
+        self.latency_cv = latency_cv
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.domain_budget = domain_budget
+        self.deadline = deadline
+        self.circuit_breaker = circuit_breaker
+        self.breaker_store = breaker_store
+
+        self._executor = None
+        self._global_limit = None
+        self._host_limits = {}
+        self._host_users = {}
+        self._scheduler = None
+
+    def _acquire_host(self, hostname):
+        """Return the semaphore limiting concurrent tests against a host."""
+        if hostname not in self._host_limits:
+            self._host_limits[hostname] = asyncio.Semaphore(self.per_host_concurrency)
+        self._host_users[hostname] = self._host_users.get(hostname, 0) + 1
+        return self._host_limits[hostname]
+
+    def _release_host(self, hostname):
+        """Forget a host's limit once no domain in progress uses it."""
+        self._host_users[hostname] -= 1
+        if not self._host_users[hostname]:
+            del self._host_users[hostname]
+            del self._host_limits[hostname]
+            self._scheduler.forget(hostname)
+
+    def past_deadline(self):
+        """Check whether the run deadline has passed."""
+        return self.deadline is not None and time.time() >= self.deadline
+
+    async def _run_test(self, probe, host_limit):
+        """
+        Run one test of a domain within the host and global limits.
+
+        Returns:
+            ProbeResult: Result of the test, or None if the domain's budget or
+            the run deadline ran out before or during it, or its circuit
+            opened
+        """
+        loop = asyncio.get_running_loop()
+
+        async with host_limit:
+            # Wait for the host's turn without holding a global slot
+            await self._scheduler.wait_turn(probe.hostname)
+
+            async with self._global_limit:
+                if probe.out_of_time() or probe.breaker_reason() is not None:
+                    return None
+                probe.start_budget(self.domain_budget)
+                try:
+                    result = await loop.run_in_executor(self._executor, probe.run_test)
+                finally:
+                    self._scheduler.test_done(probe.hostname)
+
+        return result
+
+    async def check_domain(self, domain, test_count=5):
+        """
+        Run all tests of a domain and aggregate them.
+
+        With min_test_count, the first tests run together and the rest in
+        rounds of per_host_concurrency tests, until the results are settled.
+        Tests stop early when the domain's budget or the run deadline runs
+        out, and the result is then marked "incomplete", or when the circuit
+        breaker opens. A domain in cooldown is not tested.
+
+        Args:
+            domain (str or Target): Domain to check
+            test_count (int): Number of tests to run, or the maximum number
+                with min_test_count
+
+        Returns:
+            dict: Aggregated results of all tests, or None if no test
+            completed before the run deadline
+        """
+        probe = DomainProbe(
+            domain,
+            self.cert_mode,
+            self.reuse_connections,
+            self.cert_cache,
+            self.body_mode,
+            self.body_limit,
+            self.cache_redirects,
+            self.record_hops,
+            self.connect_timeout,
+            self.read_timeout,
+            self.deadline,
+            self.circuit_breaker,
+            self.breaker_store,
+        )
+        cooldown = probe.cooldown()
+        if cooldown is not None:
+            return cooldown_result(probe.domain, cooldown, test_count)
+
+        host_limit = self._acquire_host(probe.hostname)
+        series = TestSeries(probe.domain)
+        incomplete = False
+
+        batch = test_count
+        if self.min_test_count is not None:
+            batch = max(1, min(self.min_test_count, test_count))
+
+        try:
+            while batch:
+                for result in await asyncio.gather(
+                    *(self._run_test(probe, host_limit) for _ in range(batch))
+                ):
+                    if result is not None:
+                        series.append(result)
+                    elif probe.breaker_reason() is None:
+                        incomplete = True
+
+                if probe.breaker_reason() is not None:
+                    break
+                if len(series) >= test_count or sampling_settled(
+                    series, test_count, self.latency_cv
+                ):
+                    break
+                if incomplete or probe.out_of_time():
+                    incomplete = True
+                    break
+                batch = min(self.per_host_concurrency, test_count - len(series))
+        finally:
+            probe.close()
+            self._release_host(probe.hostname)
+
+        return finish_results(probe, series, test_count, incomplete)
+
+    def _prefetching(self, domains, executor):
+        """Yield domains while resolving the upcoming ones in the background."""
+        upcoming = deque()
+        for domain in domains:
+            target = make_target(domain)
+            executor.submit(self.dns_cache.warm, urlsplit(target.https_url).hostname)
+            upcoming.append(target)
+            if len(upcoming) > DNS_PREFETCH_AHEAD:
+                yield upcoming.popleft()
+        yield from upcoming
+
+    async def check_domains(
+        self, domains, test_count=5, on_result=None, collect_results=True
+    ):
+        """
+        Check all domains concurrently.
+
+        Domains are consumed lazily, so probing starts before a streamed list
+        has been read completely and only a bounded number of domains is in
+        progress at any time. Domains not checked before the run deadline are
+        left out.
+
+        Args:
+            domains (iterable): Domains (or Targets) to check
+            test_count (int): Number of tests to run per domain
+            on_result (callable): Optional callback called with
+                (index, result) as soon as a domain completes
+            collect_results (bool): Keep all results in memory and return
+                them; disable it when ``on_result`` stores them elsewhere
+
+        Returns:
+            list: Aggregated results, in the same order as ``domains`` and
+            None for domains not checked before the deadline, or None if
+            collect_results is disabled
+        """
+        self._global_limit = asyncio.Semaphore(self.max_concurrency)
+        self._host_limits = {}
+        self._host_users = {}
+        self._scheduler = HostScheduler(self.test_interval, self.test_jitter)
+        max_in_progress = self.max_concurrency * DOMAINS_PER_SLOT
+        results = []
+
+        async def check(index, domain):
+            result = await self.check_domain(domain, test_count)
+            if result is None:
+                return
+            if collect_results:
+                results[index] = result
+            if on_result:
+                on_result(index, result)
+
+        set_dns_cache(self.dns_cache)
+        prefetch_executor = None
+        if self.dns_cache is not None and self.prefetch_dns:
+            prefetch_executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+            domains = self._prefetching(domains, prefetch_executor)
+
+        in_progress = set()
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            self._executor = executor
+            try:
+                for index, domain in enumerate(domains):
+                    if self.past_deadline():
+                        print("Run deadline reached, no more domains are started.")
+                        break
+                    if collect_results:
+                        results.append(None)
+                    in_progress.add(asyncio.create_task(check(index, domain)))
+
+                    if len(in_progress) >= max_in_progress:
+                        done, in_progress = await asyncio.wait(
+                            in_progress, return_when=asyncio.FIRST_COMPLETED
+                        )
+                        for task in done:
+                            task.result()
+
+                await asyncio.gather(*in_progress)
+            finally:
+                for task in in_progress:
+                    task.cancel()
+                self._executor = None
+                if prefetch_executor is not None:
+                    prefetch_executor.shutdown(wait=False, cancel_futures=True)
+
+        return results if collect_results else None
+
+    def run(self, domains, test_count=5, on_result=None, collect_results=True):
+        """Synchronous wrapper around ``check_domains``."""
+        return asyncio.run(
+            self.check_domains(domains, test_count, on_result, collect_results)
+        )
+
+
+def print_progress(total=None):
+    """
+    Return an ``on_result`` callback that prints one line per domain.
+
+    Args:
+        total (int): Number of domains, or None if it is not known upfront
+    """
+    start = time.monotonic()
+    completed = 0
+
+    def on_result(index, result):
+        nonlocal completed
+        completed += 1
+        print(
+            f"[{completed}/{total or '?'}] {result['domain']}: "
+            f"HTTP {result['http_status']}, HTTPS {result['https_status']}, "
+            f"SSL {result['ssl_valid']} ({time.monotonic() - start:.1f}s)"
+        )
+
+    return on_result
@@ -0,0 +1,304 @@
+"""
+Compact probe result records.
+
+A single probe returns a ``ProbeResult`` named tuple holding status enums
+instead of status strings. The tests of a domain are stored column by column
+in the typed arrays of a ``TestSeries`` rather than as a list of dicts.
+Iterating a series, or calling ``ProbeResult.as_dict``, gives the original
+per-test dicts, so code reading ``test_results`` keeps working.
+"""
+
+import math
+from array import array
+from collections import namedtuple
+from datetime import datetime
+from enum import IntEnum
+
+import numpy as np
+
+from http_probe import PHASES
+
+
+class CheckStatus(IntEnum):
+    """Outcome of an HTTP or HTTPS check."""
+
+    OK = 0
+    FAIL = 1  # The server answered with a status other than 200
+    ERROR = 2  # The request failed without an answer
+
+
+def format_status(status, status_code=None):
+    """
+    Format a check outcome as the status string used in reports.
+
+    Args:
+        status (CheckStatus): Outcome of the check
+        status_code (int): HTTP status code of the answer, if any
+
+    Returns:
+        str: "OK", "FAIL (<status code>)" or "FAIL (Error)"
+    """
+    if status == CheckStatus.OK:
+        return "OK"
+    if status == CheckStatus.ERROR:
+        return "FAIL (Error)"
+    return f"FAIL ({status_code})"
+
+
+class ProbeResult(
+    namedtuple(
+        "ProbeResult",
+        [
+            "http_status",
+            "http_code",
+            "https_status",
+            "https_code",
+            "ssl_ok",
+            "ssl_expiry",
+            "http_response_time",
+            "https_response_time",
+            "http_connection_reused",
+            "https_connection_reused",
+            "http_phases",
+            "https_phases",
+            "dns_time",
+            "http_bytes",
+            "https_bytes",
+            "http_redirects",
+            "https_redirects",
+            "http_redirect_time",
+            "https_redirect_time",
+            "http_hops",
+            "https_hops",
+            "error",
+        ],
+    )
+):
+    """Result of one test of a domain."""
+
+    __slots__ = ()
+
+    def as_dict(self, domain):
+        """
+        Convert the result to the per-test dict used by the reports.
+
+        Args:
+            domain (str): Domain the test was run against
+
+        Returns:
+            dict: Result of the single test
+        """
+        result = {
+            "domain": domain,
+            "http_status": format_status(self.http_status, self.http_code),
+            "https_status": format_status(self.https_status, self.https_code),
+            "ssl_valid": "OK" if self.ssl_ok else "FAIL",
+            "ssl_expiry": self.ssl_expiry,
+            "http_response_time": self.http_response_time,
+            "https_response_time": self.https_response_time,
+            "http_connection_reused": self.http_connection_reused,
+            "https_connection_reused": self.https_connection_reused,
+            "http_phases": self.http_phases,
+            "https_phases": self.https_phases,
+            "dns_time": self.dns_time,
+            "http_bytes": self.http_bytes,
+            "https_bytes": self.https_bytes,
+            "http_redirects": self.http_redirects,
+            "https_redirects": self.https_redirects,
+            "http_redirect_time": self.http_redirect_time,
+            "https_redirect_time": self.https_redirect_time,
+            "http_hops": self.http_hops,
+            "https_hops": self.https_hops,
+            "error": self.error,
+        }
+        if self.ssl_ok and self.ssl_expiry:
+            result["days_until_expiry"] = (self.ssl_expiry - datetime.now()).days
+        return result
+
+
+# Array type code of each numeric column of a TestSeries; phase columns hold
+# len(PHASES) values per test
+SERIES_COLUMNS = {
+    "http_status": "b",
+    "http_code": "h",
+    "https_status": "b",
+    "https_code": "h",
+    "ssl_ok": "b",
+    "ssl_expiry": "d",
+    "http_response_time": "d",
+    "https_response_time": "d",
+    "http_connection_reused": "b",
+    "https_connection_reused": "b",
+    "http_phases": "d",
+    "https_phases": "d",
+    "dns_time": "d",
+    "http_bytes": "q",
+    "https_bytes": "q",
+    "http_redirects": "h",
+    "https_redirects": "h",
+    "http_redirect_time": "d",
+    "https_redirect_time": "d",
+}
+
+# Columns of a TestSeries holding one Python object per test
+OBJECT_COLUMNS = ("errors", "http_hops", "https_hops")
+
+
+def _to_float(value):
+    return math.nan if value is None else value
+
+
+def _from_float(value):
+    return None if math.isnan(value) else value
+
+
+class TestSeries:
+    """
+    The tests of one domain, stored as one typed array per field.
+
+    Missing times and dates are stored as NaN, missing status codes and byte
+    counts as 0. Error messages and redirect hops are kept in plain lists.
+    Iterating or indexing the series gives the per-test dicts of
+    ProbeResult.as_dict; ``list(series)`` converts it to the list of dicts
+    results used to hold, e.g. before ``json.dumps``.
+    """
+
+    __slots__ = ("domain",) + OBJECT_COLUMNS + tuple(SERIES_COLUMNS)
+
+    def __init__(self, domain, results=()):
+        """
+        Args:
+            domain (str): Domain the tests were run against
+            results (iterable): ProbeResults to add
+        """
+        self.domain = domain
+        for name in OBJECT_COLUMNS:
+            setattr(self, name, [])
+        for name, typecode in SERIES_COLUMNS.items():
+            setattr(self, name, array(typecode))
+        for result in results:
+            self.append(result)
+
+    def append(self, result):
+        """Add the ProbeResult of a test."""
+        self.http_status.append(result.http_status)
+        self.http_code.append(result.http_code or 0)
+        self.https_status.append(result.https_status)
+        self.https_code.append(result.https_code or 0)
+        self.ssl_ok.append(result.ssl_ok)
+        self.ssl_expiry.append(
+            result.ssl_expiry.timestamp() if result.ssl_expiry else math.nan
+        )
+        self.http_response_time.append(_to_float(result.http_response_time))
+        self.https_response_time.append(_to_float(result.https_response_time))
+        self.http_connection_reused.append(result.http_connection_reused)
+        self.https_connection_reused.append(result.https_connection_reused)
+        for name, phases in (
+            ("http_phases", result.http_phases),
+            ("https_phases", result.https_phases),
+        ):
+            getattr(self, name).extend(
+                [phases[phase] for phase in PHASES]
+                if phases
+                else [math.nan] * len(PHASES)
+            )
+        self.dns_time.append(_to_float(result.dns_time))
+        self.http_bytes.append(result.http_bytes or 0)
+        self.https_bytes.append(result.https_bytes or 0)
+        self.http_redirects.append(result.http_redirects or 0)
+        self.https_redirects.append(result.https_redirects or 0)
+        self.http_redirect_time.append(_to_float(result.http_redirect_time))
+        self.https_redirect_time.append(_to_float(result.https_redirect_time))
+        self.http_hops.append(result.http_hops)
+        self.https_hops.append(result.https_hops)
+        self.errors.append(result.error)
+
+    def __len__(self):
+        return len(self.http_status)
+
+    def column(self, name):
+        """Return a numeric column as a NumPy array sharing the series' memory."""
+        values = np.asarray(getattr(self, name))
+        if name.endswith("_phases"):
+            return values.reshape(-1, len(PHASES))
+        return values
+
+    def get(self, index):
+        """Return the ProbeResult of the test at ``index``."""
+        phases = {}
+        for name in ("http_phases", "https_phases"):
+            start = index * len(PHASES)
+            values = getattr(self, name)[start : start + len(PHASES)]
+            phases[name] = None if math.isnan(values[0]) else dict(zip(PHASES, values))
+
+        expiry = self.ssl_expiry[index]
+        return ProbeResult(
+            http_status=CheckStatus(self.http_status[index]),
+            http_code=self.http_code[index] or None,
+            https_status=CheckStatus(self.https_status[index]),
+            https_code=self.https_code[index] or None,
+            ssl_ok=bool(self.ssl_ok[index]),
+            ssl_expiry=None if math.isnan(expiry) else datetime.fromtimestamp(expiry),
+            http_response_time=_from_float(self.http_response_time[index]),
+            https_response_time=_from_float(self.https_response_time[index]),
+            http_connection_reused=bool(self.http_connection_reused[index]),
+            https_connection_reused=bool(self.https_connection_reused[index]),
+            http_phases=phases["http_phases"],
+            https_phases=phases["https_phases"],
+            dns_time=_from_float(self.dns_time[index]),
+            http_bytes=self.http_bytes[index],
+            https_bytes=self.https_bytes[index],
+            http_redirects=self.http_redirects[index],
+            https_redirects=self.https_redirects[index],
+            http_redirect_time=_from_float(self.http_redirect_time[index]),
+            https_redirect_time=_from_float(self.https_redirect_time[index]),
+            http_hops=self.http_hops[index],
+            https_hops=self.https_hops[index],
+            error=self.errors[index],
+        )
+
+    def __getitem__(self, index):
+        """Return the per-test dict at an index, or a list of them for a slice."""
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("test index out of range")
+        return self.get(index).as_dict(self.domain)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.get(index).as_dict(self.domain)
+
+    def to_json(self):
+        """Return the series as a dict of JSON-compatible column lists."""
+        columns = {"domain": self.domain}
+        for name in OBJECT_COLUMNS:
+            columns[name] = getattr(self, name)
+        for name, typecode in SERIES_COLUMNS.items():
+            values = getattr(self, name)
+            columns[name] = (
+                [_from_float(value) for value in values]
+                if typecode == "d"
+                else values.tolist()
+            )
+        return columns
+
+    @classmethod
+    def from_json(cls, columns):
+        """Rebuild a series from the dict returned by to_json."""
+        series = cls(columns["domain"])
+        count = len(columns["http_status"])
+        for name in OBJECT_COLUMNS:
+            setattr(series, name, list(columns.get(name) or [None] * count))
+        for name, typecode in SERIES_COLUMNS.items():
+            # Columns added since a results file was written default to 0,
+            # or NaN for times
+            values = columns.get(name)
+            if values is None:
+                values = [None if typecode == "d" else 0] * count
+            if typecode == "d":
+                values = [_to_float(value) for value in values]
+            setattr(series, name, array(typecode, values))
+        return series
@@ -0,0 +1,201 @@
+"""
+Incremental result storage.
+
+``ResultSink`` appends each domain's aggregated result to a JSON Lines file as
+soon as it completes and flushes it, so a crash only loses the domains still
+in progress. ``ResultReader`` reads the file back in input order without
+loading it into memory, and can be iterated as many times as the report and
+plot stages need.
+
+A finished run ends with a completion marker line. An interrupted run can be
+resumed by appending to its file and skipping the domains already in it.
+"""
+
+import glob
+import json
+import os
+from array import array
+from datetime import datetime
+
+from records import TestSeries
+
+DATETIME_TAG = "__datetime__"
+TESTS_TAG = "__tests__"
+COMPLETE_MARKER = '{"complete":true}'
+
+
+def encode_value(value):
+    """JSON encoder hook for values json does not support natively."""
+    if isinstance(value, datetime):
+        return {DATETIME_TAG: value.isoformat()}
+    if isinstance(value, TestSeries):
+        return {TESTS_TAG: value.to_json()}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def decode_object(obj):
+    """JSON decoder hook restoring the values written by encode_value."""
+    if len(obj) == 1 and DATETIME_TAG in obj:
+        return datetime.fromisoformat(obj[DATETIME_TAG])
+    if len(obj) == 1 and TESTS_TAG in obj:
+        return TestSeries.from_json(obj[TESTS_TAG])
+    return obj
+
+
+def encode_record(index, result):
+    """Serialize a result with its position in the domain list to one line."""
+    record = {"index": index, "result": result}
+    return json.dumps(record, default=encode_value, separators=(",", ":")) + "\n"
+
+
+def decode_record(line):
+    """
+    Parse a line written by encode_record.
+
+    Returns:
+        tuple: (index, result), or None for an incomplete or invalid line
+    """
+    try:
+        record = json.loads(line, object_hook=decode_object)
+        return record["index"], record["result"]
+    except (ValueError, KeyError, TypeError):
+        # The last line may be cut short if the run was interrupted
+        return None
+
+
+def is_complete(path):
+    """Check whether a results file ends with the completion marker."""
+    with open(path, "rb") as file:
+        file.seek(0, os.SEEK_END)
+        file.seek(max(0, file.tell() - 256))
+        lines = file.read().splitlines()
+    return bool(lines) and lines[-1].decode("utf-8", "replace") == COMPLETE_MARKER
+
+
+def find_resumable(directory, prefix="results_"):
+    """
+    Find the most recent results file of an interrupted run.
+
+    Args:
+        directory (str): Directory containing the results files
+        prefix (str): File name prefix of the results files
+
+    Returns:
+        str: Path of the file, or None if the latest run finished
+    """
+    paths = sorted(glob.glob(os.path.join(directory, f"{prefix}*.jsonl")))
+    if not paths or is_complete(paths[-1]):
+        return None
+    return paths[-1]
+
+
+def completed_domains(path):
+    """
+    Get the domains that already have a complete result in a results file.
+
+    Domains whose tests were cut short by a time limit are left out, so a
+    resumed run probes them again; its result replaces the incomplete one.
+
+    Returns:
+        set: Domain names
+    """
+    domains = set()
+    with open(path, "rb") as file:
+        for line in file:
+            record = decode_record(line)
+            if record is not None and not record[1].get("incomplete"):
+                domains.add(record[1]["domain"])
+    return domains
+
+
+class ResultSink:
+    """Append-only JSON Lines sink, flushed after every domain."""
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): File to append results to; created if missing
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._file = open(path, "a", encoding="utf-8")
+        self.count = 0
+
+        # Start on a new line if an interrupted run left a partial record
+        if self._file.tell() > 0:
+            with open(path, "rb") as file:
+                file.seek(-1, os.SEEK_END)
+                if file.read(1) != b"\n":
+                    self._file.write("\n")
+
+    def write(self, index, result):
+        """Append the result of the domain at ``index`` and flush it."""
+        self._file.write(encode_record(index, result))
+        self._file.flush()
+        self.count += 1
+
+    def mark_complete(self):
+        """Record that every domain of the run has a result."""
+        self._file.write(COMPLETE_MARKER + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ResultReader:
+    """
+    Re-iterable view of the results in a sink file, in input order.
+
+    Only an index of (position, file offset) pairs is kept in memory; results
+    are read from the file one at a time while iterating.
+    """
+
+    def __init__(self, path, include_tests=True):
+        """
+        Args:
+            path (str): File written by ResultSink
+            include_tests (bool): Keep the per-test ``test_results`` lists;
+                leave them out to save memory when only aggregates are needed
+        """
+        self.path = path
+        self.include_tests = include_tests
+        self._offsets = None
+
+    def _build_index(self):
+        """Index the file by domain position, keeping the last record of each."""
+        latest = {}
+        with open(self.path, "rb") as file:
+            offset = 0
+            for line in file:
+                record = decode_record(line)
+                if record is not None:
+                    latest[record[0]] = offset
+                offset += len(line)
+
+        self._offsets = array("q", (latest[index] for index in sorted(latest)))
+
+    def __len__(self):
+        if self._offsets is None:
+            self._build_index()
+        return len(self._offsets)
+
+    def __iter__(self):
+        if self._offsets is None:
+            self._build_index()
+
+        with open(self.path, "rb") as file:
+            for offset in self._offsets:
+                file.seek(offset)
+                _, result = decode_record(file.readline())
+                if not self.include_tests:
+                    result.pop("test_results", None)
+                yield result
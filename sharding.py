@@ -0,0 +1,219 @@
+"""
+Sharded runs across worker processes.
+
+For very large domain lists, TLS handshakes, certificate parsing and result
+aggregation become CPU-bound under the GIL. ``run_sharded`` splits the list
+across worker processes, each running its own ``ProbeEngine``, and merges the
+aggregated results in the parent as they arrive. Domains are assigned to
+shards by hostname, so per-host limits still hold, and results are returned in
+the order of the input list.
+"""
+
+import math
+import multiprocessing
+import queue
+import threading
+import zlib
+
+from domain_checker import make_target
+from probe_engine import ProbeEngine
+
+# Domains waiting in each worker's input queue
+SHARD_QUEUE_SIZE = 1000
+
+
+def shard_of(domain, shards):
+    """Return the shard a domain is assigned to, stable across runs."""
+    hostname = make_target(domain).hostname
+    return zlib.crc32(hostname.lower().encode("utf-8")) % shards
+
+
+def _queued_domains(domains_queue, indices):
+    """
+    Yield the domains of a worker's input queue until its sentinel.
+
+    Args:
+        domains_queue (multiprocessing.Queue): (index, domain) entries,
+            ending with None
+        indices (dict): Receives the list position of each domain, by the
+            order it was yielded in
+    """
+    local_index = 0
+    while True:
+        entry = domains_queue.get()
+        if entry is None:
+            return
+        indices[local_index], domain = entry
+        local_index += 1
+        yield domain
+
+
+def _run_shard(shard_id, domains_queue, engine_options, test_count, results_queue):
+    """Probe the (index, domain) entries of one shard in a worker process."""
+    # Only domains in progress have an entry, so this stays bounded
+    indices = {}
+    error = None
+
+    try:
+        engine = ProbeEngine(**engine_options)
+        engine.run(
+            _queued_domains(domains_queue, indices),
+            test_count=test_count,
+            on_result=lambda local_index, result: results_queue.put(
+                (indices.pop(local_index), result)
+            ),
+            collect_results=False,
+        )
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+
+    # Tell the parent that this shard is done
+    results_queue.put((None, (shard_id, error)))
+
+
+def _feed_shards(domains, domain_queues, finished, counter, feed_errors):
+    """
+    Send each domain to its shard's input queue, then one sentinel per shard.
+
+    Runs in a thread of the parent, so results are handled while the list is
+    still being read. Domains of a shard that already stopped, for example
+    at the run deadline, are dropped instead of blocking on its full queue.
+    An error reading the list is added to ``feed_errors``; the sentinels are
+    still sent, so the workers finish the domains they already received.
+    """
+    shards = len(domain_queues)
+
+    def put(shard_id, entry):
+        while shard_id not in finished:
+            try:
+                domain_queues[shard_id].put(entry, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    try:
+        for index, domain in enumerate(domains):
+            counter[0] = index + 1
+            put(shard_of(domain, shards), (index, domain))
+            if len(finished) == shards:
+                break
+    except Exception as e:
+        feed_errors.append(e)
+    finally:
+        for shard_id in range(shards):
+            put(shard_id, None)
+
+
+def run_sharded(
+    domains,
+    shards,
+    engine_options=None,
+    test_count=5,
+    on_result=None,
+    collect_results=True,
+):
+    """
+    Check domains with one concurrent prober per worker process.
+
+    Domains are read lazily and handed to the workers through bounded
+    queues, so a streamed list is never held in memory and probing starts
+    before it has been read completely.
+
+    Args:
+        domains (iterable): Domains (or Targets) to check
+        shards (int): Number of worker processes
+        engine_options (dict): Keyword arguments for ProbeEngine; the global
+            max_concurrency is split evenly across the shards
+        test_count (int): Number of tests to run per domain
+        on_result (callable): Optional callback called in the parent with
+            (index, result) as soon as a domain completes
+        collect_results (bool): Keep all results in memory and return them
+
+    Returns:
+        list: Aggregated results, in the same order as ``domains``, or None
+        if collect_results is disabled
+    """
+    engine_options = dict(engine_options or {})
+    shards = max(1, int(shards))
+
+    if "max_concurrency" in engine_options:
+        engine_options["max_concurrency"] = math.ceil(
+            engine_options["max_concurrency"] / shards
+        )
+
+    collected = {} if collect_results else None
+    results_queue = multiprocessing.Queue()
+    domain_queues = [
+        multiprocessing.Queue(maxsize=SHARD_QUEUE_SIZE) for _ in range(shards)
+    ]
+    processes = [
+        multiprocessing.Process(
+            target=_run_shard,
+            args=(
+                shard_id,
+                domain_queues[shard_id],
+                engine_options,
+                test_count,
+                results_queue,
+            ),
+            daemon=True,
+        )
+        for shard_id in range(shards)
+    ]
+    for process in processes:
+        process.start()
+
+    # Shards that reported they are done, and the number of domains read
+    finished = set()
+    domain_count = [0]
+    feed_errors = []
+    feeder = threading.Thread(
+        target=_feed_shards,
+        args=(domains, domain_queues, finished, domain_count, feed_errors),
+        daemon=True,
+    )
+    feeder.start()
+
+    errors = []
+    try:
+        while len(finished) < shards:
+            try:
+                index, payload = results_queue.get(timeout=1)
+            except queue.Empty:
+                # A worker that died without reporting would block forever
+                if not any(process.is_alive() for process in processes):
+                    errors.append("worker process exited unexpectedly")
+                    break
+                continue
+
+            if index is None:
+                shard_id, error = payload
+                finished.add(shard_id)
+                if error:
+                    errors.append(f"shard {shard_id}: {error}")
+                continue
+
+            if collect_results:
+                collected[index] = payload
+            if on_result:
+                on_result(index, payload)
+    finally:
+        finished.update(range(shards))
+        feeder.join(timeout=5)
+        for domains_queue in domain_queues:
+            # Domains left unread must not block the parent from exiting
+            domains_queue.cancel_join_thread()
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+    # Reading the domain list failed: report its own error
+    if feed_errors:
+        raise feed_errors[0]
+    if errors:
+        raise RuntimeError(f"Sharded run failed ({'; '.join(errors)})")
+
+    if not collect_results:
+        return None
+    return [collected.get(index) for index in range(domain_count[0])]
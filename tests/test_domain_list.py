@@ -0,0 +1,27 @@
+import pytest
+
+from domain_list import iter_targets, normalize_domain
+
+
+@pytest.mark.parametrize(
+    "entry, expected",
+    [
+        ("HTTP://Example.com/x", "example.com"),
+        ("HTTPS://foo.org", "foo.org"),
+        ("https://foo.org:8443/path", "foo.org:8443"),
+        ("http-example.com:8080", "http-example.com:8080"),
+        ("httpbin.org", "httpbin.org"),
+        ("HTTP://127.0.0.1:18080/path", "127.0.0.1:18080"),
+    ],
+)
+def test_normalize_domain(entry, expected):
+    assert normalize_domain(entry) == expected
+
+
+def test_uppercase_schemes_are_not_deduplicated_together(tmp_path):
+    path = tmp_path / "domains.txt"
+    path.write_text("HTTP://Example.com/x\nHTTPS://foo.org\nfoo.org\n")
+    assert [target.domain for target in iter_targets(str(path))] == [
+        "example.com",
+        "foo.org",
+    ]
@@ -0,0 +1,103 @@
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import http_probe
+from http_probe import ConnectionPool, DeadlineExceeded, body_request, fetch
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"x" * 1000
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    do_HEAD = do_GET
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def keep_alive_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def slow_body_server():
+    """Serve a response whose body arrives one byte every 0.1 seconds."""
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen()
+    stop = threading.Event()
+
+    def serve():
+        connection, _ = server.accept()
+        with connection:
+            connection.recv(65536)
+            connection.sendall(
+                b"HTTP/1.1 200 OK\r\nContent-Length: 100000\r\n"
+                b"Connection: close\r\n\r\n"
+            )
+            while not stop.is_set():
+                try:
+                    connection.sendall(b"x")
+                except OSError:
+                    break
+                time.sleep(0.1)
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.getsockname()[1]}/"
+    stop.set()
+    server.close()
+
+
+def test_deadline_cuts_slow_body(slow_body_server):
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        fetch(slow_body_server, timeout=10, deadline=start + 1)
+    assert time.monotonic() - start < 2
+
+
+def test_deadline_cuts_slow_dns(monkeypatch):
+    def slow_getaddrinfo(*args, **kwargs):
+        time.sleep(5)
+        raise socket.gaierror(socket.EAI_NONAME, "not found")
+
+    monkeypatch.setattr(http_probe.socket, "getaddrinfo", slow_getaddrinfo)
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        fetch("http://slow.invalid/", timeout=10, deadline=start + 1)
+    assert time.monotonic() - start < 2
+
+
+@pytest.mark.parametrize(
+    "body_mode, body_limit", [("full", None), ("head", None), ("capped", 1000)]
+)
+def test_read_responses_keep_their_connection(
+    keep_alive_server, body_mode, body_limit
+):
+    method, limit = body_request(body_mode, body_limit)
+    pool = ConnectionPool()
+    reused = [
+        fetch(keep_alive_server, method=method, pool=pool, body_limit=limit)[
+            "reused"
+        ]
+        for _ in range(3)
+    ]
+    pool.close()
+    assert reused == [False, True, True]
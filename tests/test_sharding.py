@@ -0,0 +1,17 @@
+import pytest
+
+from sharding import run_sharded
+
+
+def test_domain_list_errors_reach_the_parent():
+    def domains():
+        yield "127.0.0.1:1"
+        raise OSError("corrupt domain list")
+
+    with pytest.raises(OSError, match="corrupt domain list"):
+        run_sharded(
+            domains(),
+            2,
+            {"max_concurrency": 2, "test_interval": 0},
+            test_count=1,
+        )
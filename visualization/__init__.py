@@ -1,4 +1,18 @@
-from .plots import generate_plots
-from .text_report import generate_text_report
+import importlib
 
-__all__ = ["generate_plots", "generate_text_report"]
+# The plotting stack (matplotlib, pandas) is only imported when one of these
+# functions is first used, so probe-only runs start without it
+_EXPORTS = {
+    "generate_plots": ".plots",
+    "generate_text_report": ".text_report",
+    "summarize_results": ".stats",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
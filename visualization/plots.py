@@ -1,56 +1,55 @@
 # visualization/plots.py
+import matplotlib
+
+# Render without a display, also in worker processes
+matplotlib.use("Agg")
+
 import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
 import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
 from matplotlib.colors import LinearSegmentedColormap
+from matplotlib.patches import Patch
 from datetime import datetime
 
+from .stats import METRIC_COLUMNS, count_statuses, report_stats, results_frame
+from .utils import IMAGE_FORMATS
 
-def prepare_data(results):
-    """Extract and prepare basic data from results."""
-    total_domains = len(results)
-    http_ok = sum(1 for r in results if r["http_status"] == "OK")
-    https_ok = sum(1 for r in results if r["https_status"] == "OK")
-    ssl_ok = sum(1 for r in results if r["ssl_valid"] == "OK")
+# Resolution and file format of the saved charts
+DEFAULT_DPI = 300
+DEFAULT_FORMAT = "png"
 
-    http_fail = total_domains - http_ok
-    https_fail = total_domains - https_ok
-    ssl_fail = total_domains - ssl_ok
+# Above this many domains the summary figure shows distributions and the
+# worst offenders instead of one bar per domain
+DEFAULT_LARGE_SCALE_THRESHOLD = 300
+DEFAULT_TOP_N = 20
 
-    fully_healthy = sum(
-        1
-        for r in results
-        if r["http_status"] == "OK"
-        and r["https_status"] == "OK"
-        and r["ssl_valid"] == "OK"
-    )
-    partially_healthy = (
-        sum(
-            1
-            for r in results
-            if (
-                r["http_status"] == "OK"
-                or r["https_status"] == "OK"
-                or r["ssl_valid"] == "OK"
-            )
-        )
-        - fully_healthy
-    )
-    unhealthy = total_domains - fully_healthy - partially_healthy
-
-    return {
-        "total_domains": total_domains,
-        "http_ok": http_ok,
-        "https_ok": https_ok,
-        "ssl_ok": ssl_ok,
-        "http_fail": http_fail,
-        "https_fail": https_fail,
-        "ssl_fail": ssl_fail,
-        "fully_healthy": fully_healthy,
-        "partially_healthy": partially_healthy,
-        "unhealthy": unhealthy,
-    }
+# Domains per image of the detail charts drawn for more than 30 domains
+DEFAULT_DETAIL_PAGE_SIZE = 100
+
+# Number of points drawn for each response time ECDF
+ECDF_POINTS = 512
+
+# Upper bound (inclusive), label and color of each certificate expiry bucket
+EXPIRY_BUCKETS = (
+    (7, "≤ 7", "#F44336"),
+    (30, "8-30", "#FF9800"),
+    (90, "31-90", "#FFC107"),
+    (180, "91-180", "#8BC34A"),
+    (365, "181-365", "#4CAF50"),
+    (float("inf"), "> 365", "#2E7D32"),
+)
+
+# Colors of the request phases in the phase breakdown charts
+PHASE_COLORS = {
+    "dns": "#9E9E9E",
+    "connect": "#2196F3",
+    "tls": "#673AB7",
+    "ttfb": "#FF9800",
+    "body": "#009688",
+}
 
 
 def create_status_summary(ax, data):
@@ -324,8 +323,62 @@ def create_ssl_expiry_chart(ax, results, max_domains_to_show=25):
     return truncated, len(ssl_valid_domains)
 
 
-def create_response_time_chart(ax, results, max_domains_to_show=40):
-    """Create the response time comparison chart with dynamic sizing."""
+def get_phase_means(result, protocol, phases):
+    """Get the mean time of each phase of a protocol, 0 when unavailable."""
+    phase_stats = result.get(f"{protocol}_phase_stats") or {}
+    return [phase_stats.get(phase, {}).get("mean", 0) for phase in phases]
+
+
+def create_phase_bars(ax, results, y_pos, bar_height):
+    """Create stacked bars of the mean time spent in each request phase."""
+    phases = next(
+        (
+            list(r[key])
+            for r in results
+            for key in ("http_phase_stats", "https_phase_stats")
+            if r.get(key)
+        ),
+        list(PHASE_COLORS),
+    )
+
+    for offset, protocol, hatch in (
+        (-bar_height / 2, "http", None),
+        (bar_height / 2, "https", "//"),
+    ):
+        means = np.array([get_phase_means(r, protocol, phases) for r in results])
+        left = np.zeros(len(results))
+
+        for phase_idx, phase in enumerate(phases):
+            ax.barh(
+                y_pos + offset,
+                means[:, phase_idx],
+                bar_height,
+                left=left,
+                color=PHASE_COLORS.get(phase, "#607D8B"),
+                hatch=hatch,
+                edgecolor="white",
+            )
+            left += means[:, phase_idx]
+
+    # Phases are told apart by color, protocols by hatching
+    handles = [
+        Patch(facecolor=PHASE_COLORS.get(phase, "#607D8B"), label=phase.upper())
+        for phase in phases
+    ]
+    handles.append(Patch(facecolor="white", edgecolor="gray", label="HTTP"))
+    handles.append(
+        Patch(facecolor="white", edgecolor="gray", hatch="//", label="HTTPS")
+    )
+    ax.legend(handles=handles, fontsize=8, ncol=2)
+
+
+def create_response_time_chart(ax, results, max_domains_to_show=40, show_phases=False):
+    """
+    Create the response time comparison chart with dynamic sizing.
+
+    With ``show_phases``, each bar is stacked by the mean time spent in each
+    request phase (DNS, connect, TLS, time to first byte and body).
+    """
     # Get domains with response time data
     response_time_domains = [
         r
@@ -389,20 +442,23 @@ def create_response_time_chart(ax, results, max_domains_to_show=40):
     bar_height = 0.35
 
     # Create bars
-    ax.barh(
-        y_pos - bar_height / 2,
-        http_times,
-        bar_height,
-        label="HTTP",
-        color="#2196F3",
-    )
-    ax.barh(
-        y_pos + bar_height / 2,
-        https_times,
-        bar_height,
-        label="HTTPS",
-        color="#673AB7",
-    )
+    if show_phases:
+        create_phase_bars(ax, response_time_domains, y_pos, bar_height)
+    else:
+        ax.barh(
+            y_pos - bar_height / 2,
+            http_times,
+            bar_height,
+            label="HTTP",
+            color="#2196F3",
+        )
+        ax.barh(
+            y_pos + bar_height / 2,
+            https_times,
+            bar_height,
+            label="HTTPS",
+            color="#673AB7",
+        )
 
     # Add time text only for times > 0
     for i, (h, s) in enumerate(zip(http_times, https_times)):
@@ -427,11 +483,14 @@ def create_response_time_chart(ax, results, max_domains_to_show=40):
     ax.set_yticklabels(domains_rt, fontsize=fontsize)
 
     title = "Average Response Time (seconds)"
+    if show_phases:
+        title = "Average Response Time by Phase (seconds)"
     if truncated:
         title += f" - Top {max_domains_to_show} of {len(response_time_domains)}"
     ax.set_title(title)
     ax.set_xlabel("Time (seconds)")
-    ax.legend()
+    if not show_phases:
+        ax.legend()
 
     # Add explanation for percentage differences
     ax.text(
@@ -448,24 +507,312 @@ def create_response_time_chart(ax, results, max_domains_to_show=40):
     return truncated, len(response_time_domains)
 
 
-def generate_plots(results, output_dir="results"):
+def create_worst_success_chart(ax, frame, top_n=DEFAULT_TOP_N):
+    """Create a bar chart of the domains with the lowest success rates."""
+    rates = frame[["http_success_rate", "https_success_rate", "ssl_success_rate"]]
+    worst = frame.assign(avg_rate=rates.mean(axis=1)).nsmallest(top_n, "avg_rate")
+    worst = worst.iloc[::-1]  # Lowest rate at the top
+
+    y_pos = np.arange(len(worst))
+    bar_height = 0.25
+    for offset, column, label, color in (
+        (bar_height, "http_success_rate", "HTTP", "#2196F3"),
+        (0, "https_success_rate", "HTTPS", "#673AB7"),
+        (-bar_height, "ssl_success_rate", "SSL", "#009688"),
+    ):
+        ax.barh(y_pos + offset, worst[column], bar_height, label=label, color=color)
+
+    ax.set_yticks(y_pos)
+    ax.set_yticklabels(worst["domain"], fontsize=8)
+    ax.set_xlim(0, 105)
+    ax.set_xlabel("Success Rate (%)")
+    ax.set_title(f"Lowest Success Rates - Top {len(worst)} of {len(frame)}")
+    ax.legend(loc="lower right")
+
+
+def create_expiry_buckets_chart(ax, frame):
+    """Create a bar chart counting certificates by days until expiry."""
+    days = frame["days_until_expiry"].dropna().to_numpy()
+    if not days.size:
+        ax.text(
+            0.5,
+            0.5,
+            "No valid SSL certificates found",
+            ha="center",
+            va="center",
+            fontsize=14,
+        )
+        ax.set_title("Days Until SSL Certificate Expiry")
+        return
+
+    upper_bounds = [bound for bound, _, _ in EXPIRY_BUCKETS]
+    counts = np.bincount(
+        np.searchsorted(upper_bounds, days, side="left"),
+        minlength=len(EXPIRY_BUCKETS),
+    )
+
+    x = np.arange(len(EXPIRY_BUCKETS))
+    ax.bar(x, counts, color=[color for _, _, color in EXPIRY_BUCKETS])
+    for i, count in enumerate(counts):
+        ax.text(i, count, str(count), ha="center", va="bottom")
+
+    ax.set_xticks(x)
+    ax.set_xticklabels([label for _, label, _ in EXPIRY_BUCKETS])
+    ax.set_xlabel("Days Until Expiry")
+    ax.set_ylabel("Certificates")
+    ax.set_title(f"Days Until SSL Certificate Expiry ({days.size} certificates)")
+
+
+def create_latency_distribution_chart(ax, frame, top_n=5):
+    """Create ECDFs of the average response times, with the slowest domains."""
+    has_data = False
+    for column, label, color in (
+        ("avg_http_response_time", "HTTP", "#2196F3"),
+        ("avg_https_response_time", "HTTPS", "#673AB7"),
+    ):
+        times = frame[column].dropna().to_numpy()
+        if not times.size:
+            continue
+        has_data = True
+
+        # A fixed number of quantiles keeps the cost independent of size
+        fractions = np.linspace(0, 1, ECDF_POINTS)
+        ax.step(
+            np.quantile(times, fractions),
+            fractions * 100,
+            where="post",
+            color=color,
+            label=f"{label} ({times.size} domains)",
+        )
+        for pct, style in ((50, ":"), (95, "--")):
+            ax.axvline(
+                np.percentile(times, pct),
+                color=color,
+                linestyle=style,
+                linewidth=1,
+                label=f"{label} p{pct}",
+            )
+
+    if not has_data:
+        ax.text(
+            0.5,
+            0.5,
+            "No response time data available",
+            ha="center",
+            va="center",
+            fontsize=14,
+        )
+        ax.set_title("Response Time Distribution")
+        return
+
+    # List the slowest domains over HTTPS
+    slowest = frame.nlargest(top_n, "avg_https_response_time")
+    slowest_text = "Slowest (HTTPS):\n" + "\n".join(
+        f"{row.domain}: {row.avg_https_response_time:.2f}s"
+        for row in slowest.itertuples()
+        if not np.isnan(row.avg_https_response_time)
+    )
+    ax.text(
+        0.98,
+        0.02,
+        slowest_text,
+        transform=ax.transAxes,
+        fontsize=8,
+        ha="right",
+        va="bottom",
+        bbox=dict(facecolor="white", alpha=0.8, boxstyle="round,pad=0.3"),
+    )
+
+    ax.set_xscale("log")
+    ax.set_xlabel("Average Response Time (seconds, log scale)")
+    ax.set_ylabel("Domains (%)")
+    ax.set_ylim(0, 100)
+    ax.set_title("Response Time Distribution (ECDF)")
+    ax.legend(loc="upper left", fontsize=8)
+
+
+def save_figure(fig, filename, dpi=DEFAULT_DPI, latest_filename=None):
+    """
+    Save a figure once and close it.
+
+    Parameters:
+        fig (Figure): Figure to save
+        filename (str): File to save to; the extension sets the format
+        dpi (int): Resolution of raster formats
+        latest_filename (str): Optional second name, copied from the saved
+            file instead of rendering the figure again
+    """
+    fig.savefig(filename, dpi=dpi, bbox_inches="tight")
+    plt.close(fig)
+
+    if latest_filename:
+        shutil.copyfile(filename, latest_filename)
+
+
+def frame_results(frame):
+    """
+    Convert rows of a results frame back to the result dicts the charts read.
+
+    Missing values are left out, like in the original results.
+    """
+    results = []
+    for row in frame.to_dict("records"):
+        result = {
+            "domain": row["domain"],
+            "http_status": "OK" if row["http_ok"] else "FAIL",
+            "https_status": "OK" if row["https_ok"] else "FAIL",
+            "ssl_valid": "OK" if row["ssl_ok"] else "FAIL",
+        }
+        for column in (*METRIC_COLUMNS, "days_until_expiry"):
+            if not pd.isna(row[column]):
+                result[column] = row[column]
+        if "days_until_expiry" in result:
+            result["days_until_expiry"] = int(result["days_until_expiry"])
+        results.append(result)
+    return results
+
+
+def detail_chart_jobs(frame, output_dir, timestamp, image_format, dpi, page_size):
+    """
+    Split the detail charts into pages of a fixed number of domains.
+
+    Domains are ordered across all pages the same way the charts order them
+    within a page, so pages continue where the previous one ended.
+
+    Returns:
+        list: (function, args) rendering jobs, one per page
+    """
+    average_rate = frame[
+        ["http_success_rate", "https_success_rate", "ssl_success_rate"]
+    ].mean(axis=1)
+    times = frame[["avg_http_response_time", "avg_https_response_time"]]
+
+    charts = (
+        (
+            create_detailed_success_chart,
+            "success_rates",
+            frame.iloc[np.argsort(-average_rate.to_numpy(), kind="stable")],
+        ),
+        (
+            create_detailed_ssl_chart,
+            "ssl_expiry",
+            frame[frame["ssl_ok"]].sort_values(
+                "days_until_expiry", kind="stable", na_position="first"
+            ),
+        ),
+        (
+            create_detailed_response_chart,
+            "response_times",
+            frame[times.notna().any(axis=1)].sort_values(
+                "avg_http_response_time", kind="stable", na_position="last"
+            ),
+        ),
+    )
+
+    jobs = []
+    for function, name, ordered in charts:
+        pages = -(-len(ordered) // page_size)
+        for page in range(pages):
+            start = page * page_size
+            rows = ordered.iloc[start : start + page_size]
+            suffix = f"_p{page + 1:0{len(str(pages))}d}" if pages > 1 else ""
+            page_label = (
+                f"Page {page + 1}/{pages}, domains {start + 1}-{start + len(rows)}"
+                f" of {len(ordered)}"
+                if pages > 1
+                else ""
+            )
+            filename = f"{output_dir}/{name}_detail_{timestamp}{suffix}.{image_format}"
+            jobs.append(
+                (function, (frame_results(rows), filename, dpi, page_label))
+            )
+    return jobs
+
+
+def render_charts(jobs, workers=None):
+    """
+    Render independent detail charts, in parallel worker processes if possible.
+
+    Parameters:
+        jobs (list): (function, args) tuples; each function draws and saves
+            one chart
+        workers (int): Maximum number of worker processes (default: CPU
+            count); 1 renders the charts one after another in this process
+
+    Returns:
+        list: Futures of the jobs, or None if they were rendered in-process
+    """
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        for function, args in jobs:
+            function(*args)
+        return None
+
+    executor = ProcessPoolExecutor(max_workers=workers)
+    futures = [executor.submit(function, *args) for function, args in jobs]
+    executor.shutdown(wait=False)
+    return futures
+
+
+def generate_plots(
+    results,
+    output_dir="results",
+    show_phases=False,
+    dpi=DEFAULT_DPI,
+    image_format=DEFAULT_FORMAT,
+    workers=None,
+    large_scale_threshold=DEFAULT_LARGE_SCALE_THRESHOLD,
+    detail_page_size=DEFAULT_DETAIL_PAGE_SIZE,
+):
     """
     Generate visualizations of domain health check results with dynamic sizing.
 
     Parameters:
         results (list): List of domain check results
         output_dir (str): Directory to save output files
+        show_phases (bool): Break response times down by request phase
+        dpi (int): Resolution of the saved charts
+        image_format (str): File format of the charts, one of IMAGE_FORMATS
+        workers (int): Worker processes rendering the detail charts (default:
+            CPU count)
+        large_scale_threshold (int): Above this many domains, chart success
+            rates, expiry and response times as distributions and top
+            offenders instead of one bar per domain; None to never do so
+        detail_page_size (int): Domains per image of the detail charts
 
     Returns:
         dict: Statistics about the results for reporting
     """
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(
+            f"Unknown image format '{image_format}', expected one of {IMAGE_FORMATS}"
+        )
+
     # Create output directory if it doesn't exist
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
     # Prepare data
-    data = prepare_data(results)
+    frame = results_frame(results)
+    data = count_statuses(frame)
     total_domains = data["total_domains"]
+    large_scale = (
+        large_scale_threshold is not None and total_domains > large_scale_threshold
+    )
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    # Always create detailed charts when domain count is high, in pages of a
+    # fixed size; they do not depend on the summary figure, so they render
+    # while it is drawn
+    futures = None
+    if total_domains > 30:
+        print("Creating additional detailed charts for better visibility...")
+        futures = render_charts(
+            detail_chart_jobs(
+                frame, output_dir, timestamp, image_format, dpi, detail_page_size
+            ),
+            workers,
+        )
 
     # Dynamically calculate figure height based on domain count
     # More aggressive scaling for larger domain counts
@@ -482,6 +829,10 @@ def generate_plots(results, output_dir="results"):
     # Cap maximum height to prevent excessively tall figures
     fig_height = min(fig_height, 36)
 
+    # Aggregated charts have the same size for any number of domains
+    if large_scale:
+        fig_height = 18
+
     # Create a figure with dynamic height
     fig = plt.figure(figsize=(15, fig_height))
     fig.suptitle(
@@ -490,7 +841,7 @@ def generate_plots(results, output_dir="results"):
 
     # Adjust the grid layout based on domain count
     # For many domains, use a more vertical layout
-    if total_domains > 40:
+    if total_domains > 40 and not large_scale:
         # Use a 4x2 grid for many domains
         ax1 = plt.subplot(5, 2, 1)  # Status summary (top left)
         ax2 = plt.subplot(5, 2, 2)  # Health pie chart (top right)
@@ -511,21 +862,20 @@ def generate_plots(results, output_dir="results"):
     create_status_summary(ax1, data)
     create_health_pie_chart(ax2, data)
 
-    # Calculate max domains to show based on figure height
-    # Use a more aggressive scaling to show more domains in taller figures
-    max_success_domains = max(10, int(fig_height * 2.5))
-    max_ssl_domains = max(10, int(fig_height * 2.5))
-    max_response_domains = max(15, int(fig_height * 3.5))
+    if large_scale:
+        create_worst_success_chart(ax3, frame)
+        create_expiry_buckets_chart(ax4, frame)
+        create_latency_distribution_chart(ax5, frame)
+    else:
+        # Calculate max domains to show based on figure height
+        # Use a more aggressive scaling to show more domains in taller figures
+        max_success_domains = max(10, int(fig_height * 2.5))
+        max_ssl_domains = max(10, int(fig_height * 2.5))
+        max_response_domains = max(15, int(fig_height * 3.5))
 
-    success_truncated, total_success_domains = create_success_rate_chart(
-        ax3, results, max_success_domains
-    )
-    ssl_truncated, total_ssl_domains = create_ssl_expiry_chart(
-        ax4, results, max_ssl_domains
-    )
-    response_truncated, total_response_domains = create_response_time_chart(
-        ax5, results, max_response_domains
-    )
+        create_success_rate_chart(ax3, results, max_success_domains)
+        create_ssl_expiry_chart(ax4, results, max_ssl_domains)
+        create_response_time_chart(ax5, results, max_response_domains, show_phases)
 
     # Adjust layout with more padding for larger domain counts
     if total_domains > 30:
@@ -533,50 +883,61 @@ def generate_plots(results, output_dir="results"):
     else:
         plt.tight_layout(rect=[0, 0.03, 1, 0.95])
 
-    # Save the plot with timestamp and a generic latest version
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{output_dir}/domain_health_check_{timestamp}.png"
-    latest_filename = f"{output_dir}/domain_health_check_latest.png"
-
-    plt.savefig(filename, dpi=300, bbox_inches="tight")
-    plt.savefig(latest_filename, dpi=300, bbox_inches="tight")
+    # Save the plot with timestamp and copy it to a generic latest version
+    filename = f"{output_dir}/domain_health_check_{timestamp}.{image_format}"
+    latest_filename = f"{output_dir}/domain_health_check_latest.{image_format}"
+    save_figure(fig, filename, dpi, latest_filename)
 
     print(f"Results image saved as '{filename}' and '{latest_filename}'")
 
-    # Always create detailed charts when domain count is high
-    if total_domains > 30:
-        print("Creating additional detailed charts for better visibility...")
+    # Wait for the detail charts rendering in worker processes
+    for future in futures or ():
+        future.result()
 
-        # Create success rate chart with all domains
-        create_detailed_success_chart(
-            results, f"{output_dir}/success_rates_detail_{timestamp}.png"
-        )
+    # Return data for the text report
+    return report_stats(data)
 
-        # Create SSL expiry chart with all domains if there are any valid SSL domains
-        if total_ssl_domains > 0:
-            create_detailed_ssl_chart(
-                results, f"{output_dir}/ssl_expiry_detail_{timestamp}.png"
-            )
 
-        # Create response time chart with all domains if there is response time data
-        if total_response_domains > 0:
-            create_detailed_response_chart(
-                results, f"{output_dir}/response_times_detail_{timestamp}.png"
-            )
+def detail_figure(domain_count):
+    """Create a figure tall enough for one bar group per domain."""
+    height_per_domain = 0.4  # Inches per domain
+    min_height = 10  # Minimum height in inches
+    return plt.subplots(figsize=(15, max(min_height, domain_count * height_per_domain)))
 
-    # Return data for the text report
-    return {
-        "total": total_domains,
-        "http_ok": data["http_ok"],
-        "https_ok": data["https_ok"],
-        "ssl_ok": data["ssl_ok"],
-        "fully_healthy": data["fully_healthy"],
-        "partially_healthy": data["partially_healthy"],
-        "unhealthy": data["unhealthy"],
-    }
-
-
-def create_detailed_response_chart(results, filename):
+
+def create_detailed_success_chart(results, filename, dpi=DEFAULT_DPI, page_label=""):
+    """Create a detailed success rate chart showing every given domain."""
+    fig, ax = detail_figure(len(results))
+    create_success_rate_chart(ax, results, max_domains_to_show=len(results))
+    if page_label:
+        ax.set_title(f"{ax.get_title()} - {page_label}")
+
+    # Save the detailed chart
+    plt.tight_layout()
+    save_figure(fig, filename, dpi)
+    print(f"Detailed success rate chart saved as '{filename}'")
+
+
+def create_detailed_ssl_chart(results, filename, dpi=DEFAULT_DPI, page_label=""):
+    """Create a detailed SSL expiry chart showing every given domain with a valid certificate."""
+    ssl_valid_count = sum(1 for r in results if r["ssl_valid"] == "OK")
+    if not ssl_valid_count:
+        return  # No valid certificates to display
+
+    fig, ax = detail_figure(ssl_valid_count)
+    create_ssl_expiry_chart(ax, results, max_domains_to_show=ssl_valid_count)
+    if page_label:
+        ax.set_title(f"{ax.get_title()} - {page_label}")
+
+    # Save the detailed chart
+    plt.tight_layout()
+    save_figure(fig, filename, dpi)
+    print(f"Detailed SSL expiry chart saved as '{filename}'")
+
+
+def create_detailed_response_chart(
+    results, filename, dpi=DEFAULT_DPI, page_label=""
+):
     """Create a detailed response time chart showing all domains with response time data."""
     # Get domains with response time data
     response_time_domains = [
@@ -594,10 +955,7 @@ def create_detailed_response_chart(results, filename):
     )
 
     # Create larger figure for detailed view
-    height_per_domain = 0.4  # Inches per domain
-    min_height = 10  # Minimum height in inches
-    height = max(min_height, len(results) * height_per_domain)
-    fig, ax = plt.subplots(figsize=(15, height))
+    fig, ax = detail_figure(len(response_time_domains))
 
     domains_rt = [r["domain"] for r in response_time_domains]
 
@@ -687,7 +1045,10 @@ def create_detailed_response_chart(results, filename):
 
     ax.set_yticks(y_pos)
     ax.set_yticklabels(domains_rt, fontsize=fontsize)
-    ax.set_title(f"Average Response Time (seconds) - All {len(domains_rt)} Domains")
+    title = f"Average Response Time (seconds) - All {len(domains_rt)} Domains"
+    if page_label:
+        title = f"Average Response Time (seconds) - {page_label}"
+    ax.set_title(title)
     ax.set_xlabel("Time (seconds)")
     ax.legend()
 
@@ -705,5 +1066,5 @@ def create_detailed_response_chart(results, filename):
 
     # Save the detailed chart
     plt.tight_layout()
-    plt.savefig(filename, dpi=300, bbox_inches="tight")
+    save_figure(fig, filename, dpi)
     print(f"Detailed response time chart saved as '{filename}'")
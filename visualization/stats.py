@@ -0,0 +1,96 @@
+# visualization/stats.py
+import numpy as np
+import pandas as pd
+
+# Health class of a domain by how many of HTTP, HTTPS and SSL are OK
+HEALTH_CLASSES = ("unhealthy", "partially_healthy", "fully_healthy")
+
+
+# Numeric columns of the results loaded by results_frame; missing values
+# become NaN
+METRIC_COLUMNS = (
+    "http_success_rate",
+    "https_success_rate",
+    "ssl_success_rate",
+    "avg_http_response_time",
+    "avg_https_response_time",
+)
+
+
+def results_frame(results):
+    """
+    Load the columns the charts and statistics need into a DataFrame in one pass.
+
+    Returns:
+        DataFrame: One row per domain with "domain", one boolean column per
+        check ("http_ok", "https_ok", "ssl_ok"), the METRIC_COLUMNS,
+        "days_until_expiry" of valid certificates and the "health" class
+    """
+    frame = pd.DataFrame.from_records(
+        (
+            (
+                r["domain"],
+                r["http_status"] == "OK",
+                r["https_status"] == "OK",
+                r["ssl_valid"] == "OK",
+                *(r.get(column) for column in METRIC_COLUMNS),
+                r.get("days_until_expiry") if r["ssl_valid"] == "OK" else None,
+            )
+            for r in results
+        ),
+        columns=[
+            "domain",
+            "http_ok",
+            "https_ok",
+            "ssl_ok",
+            *METRIC_COLUMNS,
+            "days_until_expiry",
+        ],
+    )
+    for column in (*METRIC_COLUMNS, "days_until_expiry"):
+        frame[column] = pd.to_numeric(frame[column], errors="coerce").astype(float)
+
+    checks = frame[["http_ok", "https_ok", "ssl_ok"]].to_numpy(dtype=bool)
+    health = np.where(checks.all(axis=1), 2, np.where(checks.any(axis=1), 1, 0))
+    frame["health"] = pd.Categorical.from_codes(health, HEALTH_CLASSES)
+    return frame
+
+
+def count_statuses(frame):
+    """Count the OK and failed checks and the health classes of a results frame."""
+    total_domains = len(frame)
+
+    ok_counts = frame[["http_ok", "https_ok", "ssl_ok"]].sum()
+    health_counts = frame["health"].value_counts()
+
+    data = {"total_domains": total_domains}
+    for check in ("http", "https", "ssl"):
+        data[f"{check}_ok"] = int(ok_counts[f"{check}_ok"])
+        data[f"{check}_fail"] = total_domains - data[f"{check}_ok"]
+    for health_class in reversed(HEALTH_CLASSES):
+        data[health_class] = int(health_counts[health_class])
+
+    return data
+
+
+def prepare_data(results):
+    """Extract and prepare basic data from results."""
+    return count_statuses(results_frame(results))
+
+
+def report_stats(data):
+    """Select the statistics used by the text report from prepared data."""
+    return {
+        "total": data["total_domains"],
+        "http_ok": data["http_ok"],
+        "https_ok": data["https_ok"],
+        "ssl_ok": data["ssl_ok"],
+        "fully_healthy": data["fully_healthy"],
+        "partially_healthy": data["partially_healthy"],
+        "unhealthy": data["unhealthy"],
+    }
+
+
+def summarize_results(results):
+    """Compute the text report statistics without drawing any charts."""
+    return report_stats(prepare_data(results))
@@ -1,132 +1,297 @@
 # visualization/text_report.py
 from datetime import datetime
+import os
+import shutil
+import tempfile
 import pytz
 
+# Characters used for each request phase in the text phase bars
+PHASE_SYMBOLS = {"dns": "D", "connect": "C", "tls": "T", "ttfb": "W", "body": "B"}
 
-# Generate a text report of the domain health check.
-def generate_text_report(results, stats):
 
-    report_file = "domain_health_report.txt"
+# Draw a text stacked bar of the mean time spent in each request phase.
+def format_phase_bar(phase_stats, scale, width=40):
+    bar = ""
+    for phase, values in phase_stats.items():
+        symbol = PHASE_SYMBOLS.get(phase, "?")
+        bar += symbol * round(values["mean"] / scale * width) if scale else ""
+    return f"[{bar:<{width}}]"
 
-    # Get current time from environment or use system time
-    try:
-        from datetime import datetime
 
-        korean_tz = pytz.timezone("Asia/Seoul")
-        current_time = datetime.now(korean_tz).strftime("%Y-%m-%d %H:%M:%S")
-    except Exception:
-        # Fallback to simple datetime if pytz is not available
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+# Report layouts: a block per domain, one line per domain, or one line per
+# domain that is not fully healthy
+REPORT_MODES = ("full", "compact", "failures")
+
+# Write buffer size of the report file
+BUFFER_SIZE = 1 << 20
+
 
-    with open(report_file, "w", encoding="utf-8") as f:
-        f.write("Domain Health Check Report\n")
-        f.write("=" * 80 + "\n")
-        f.write(f"Date and Time: {current_time}\n")
-        f.write("=" * 80 + "\n\n")
+# Write the block of one domain for the full report.
+def write_domain_block(f, idx, r, show_phases=False, phase_scale=0):
+    f.write(f"{idx}. {r['domain']}\n")
+    f.write(
+        f"   HTTP status: {r['http_status']} (Success rate: {r['http_success_rate']:.0f}%)\n"
+    )
+    f.write(
+        f"   HTTPS status: {r['https_status']} (Success rate: {r['https_success_rate']:.0f}%)\n"
+    )
+    f.write(
+        f"   SSL certificate: {r['ssl_valid']} (Success rate: {r['ssl_success_rate']:.0f}%)\n"
+    )
 
-        f.write(f"Total domains: {stats['total']}\n")
+    if r.get("skip_reason"):
         f.write(
-            f"HTTP status OK: {stats['http_ok']} ({stats['http_ok']/stats['total']*100:.1f}%)\n"
+            f"   Tests skipped: {r.get('tests_skipped', 0)} ({r['skip_reason']})\n"
         )
+    if r.get("incomplete"):
+        f.write("   Tests cut short by the time budget or the run deadline\n")
+
+    # Add redirect details: reachable only through redirects, and the
+    # recorded redirect chain with the latency of each hop
+    for protocol in ("http", "https"):
+        if r.get(f"{protocol}_reachability") == "redirect-only":
+            f.write(f"   {protocol.upper()} reachable only through redirects\n")
+        if f"avg_{protocol}_redirect_time" in r:
+            f.write(
+                f"   Average {protocol.upper()} redirect time: "
+                f"{r[f'avg_{protocol}_redirect_time']:.2f} seconds\n"
+            )
+        for hop in r.get(f"{protocol}_redirect_chain", ()):
+            f.write(
+                f"      -> {hop['url']} ({hop['status_code']}, "
+                f"{hop['elapsed']:.3f}s)\n"
+            )
+
+    # Add response times if available
+    if "avg_http_response_time" in r:
         f.write(
-            f"HTTPS status OK: {stats['https_ok']} ({stats['https_ok']/stats['total']*100:.1f}%)\n"
+            f"   Average HTTP response time: {r['avg_http_response_time']:.2f} seconds\n"
         )
+    if "avg_https_response_time" in r:
         f.write(
-            f"SSL certificates valid: {stats['ssl_ok']} ({stats['ssl_ok']/stats['total']*100:.1f}%)\n"
+            f"   Average HTTPS response time: {r['avg_https_response_time']:.2f} seconds\n"
         )
+
+    if "avg_dns_time" in r:
+        f.write(f"   Average DNS resolution time: {r['avg_dns_time']:.3f} seconds\n")
+
+    if "http_bytes_received" in r:
         f.write(
-            f"Fully healthy domains: {stats['fully_healthy']} ({stats['fully_healthy']/stats['total']*100:.1f}%)\n"
+            f"   Bytes received: HTTP {r['http_bytes_received']:,}, "
+            f"HTTPS {r['https_bytes_received']:,}\n"
         )
-        f.write(
-            f"Partially healthy domains: {stats['partially_healthy']} ({stats['partially_healthy']/stats['total']*100:.1f}%)\n"
+
+    # Add cold/warm connection split when connections were reused
+    for protocol in ("http", "https"):
+        warm_key = f"avg_{protocol}_warm_response_time"
+        cold_key = f"avg_{protocol}_cold_response_time"
+        if warm_key in r:
+            cold_text = f"{r[cold_key]:.2f}s" if cold_key in r else "N/A"
+            f.write(
+                f"   {protocol.upper()} cold/warm connection: "
+                f"{cold_text} / {r[warm_key]:.2f}s\n"
+            )
+
+    # Add phase breakdown (mean / p95 per phase) with a stacked bar
+    if show_phases:
+        for protocol in ("http", "https"):
+            phase_stats = r.get(f"{protocol}_phase_stats")
+            if not phase_stats:
+                continue
+            f.write(
+                f"   {protocol.upper()} phases "
+                f"{format_phase_bar(phase_stats, phase_scale)}\n"
+            )
+            f.write(
+                "      "
+                + ", ".join(
+                    f"{phase} {values['mean']:.3f}s/{values['p95']:.3f}s"
+                    for phase, values in phase_stats.items()
+                )
+                + " (mean/p95)\n"
+            )
+
+    if r["ssl_valid"] == "OK" and r.get("ssl_expiry"):
+        expiry_date = r["ssl_expiry"].strftime("%Y-%m-%d")
+        days = r.get("days_until_expiry", "N/A")
+
+        if days != "N/A" and days <= 7:
+            f.write(
+                f"   SSL expiry date: {expiry_date} (⚠️ CRITICAL: ONLY {days} DAYS REMAINING! ⚠️)\n"
+            )
+        elif days != "N/A" and days <= 30:
+            f.write(
+                f"   SSL expiry date: {expiry_date} (⚠️ WARNING: ONLY {days} DAYS REMAINING!)\n"
+            )
+        else:
+            f.write(f"   SSL expiry date: {expiry_date}\n")
+            f.write(f"   Days remaining: {days} days\n")
+
+    # Add detailed test results
+    f.write("\n   Individual test results:\n")
+    for test_idx, test in enumerate(r["test_results"], 1):
+        f.write(f"   Test {test_idx}: ")
+        http_status = "✓" if test["http_status"].startswith("OK") else "✗"
+        https_status = "✓" if test["https_status"].startswith("OK") else "✗"
+        ssl_status = "✓" if test["ssl_valid"] == "OK" else "✗"
+        f.write(f"HTTP: {http_status}, HTTPS: {https_status}, SSL: {ssl_status}\n")
+
+    f.write("-" * 80 + "\n")
+
+
+# Format one domain as a single line for the compact reports.
+def format_compact_line(idx, r):
+    response_time = r.get("avg_https_response_time", r.get("avg_http_response_time"))
+    response_text = f"{response_time:.2f}s" if response_time is not None else "N/A"
+    days = r.get("days_until_expiry") if r["ssl_valid"] == "OK" else None
+    days_text = f"{days}d" if days is not None else "N/A"
+    return (
+        f"{idx}. {r['domain']} | HTTP {r['http_status']} {r['http_success_rate']:.0f}%"
+        f" | HTTPS {r['https_status']} {r['https_success_rate']:.0f}%"
+        f" | SSL {r['ssl_valid']} {r['ssl_success_rate']:.0f}%"
+        f" | {response_text} | expiry {days_text}"
+        + (f" | skipped: {r['skip_reason']}" if r.get("skip_reason") else "")
+        + "\n"
+    )
+
+
+# Write the summary of domains with certificates expiring within 30 days,
+# from (days, domain, expiry date) entries collected while streaming.
+def write_expiring_certificates(f, expiring):
+    if not expiring:
+        return
+    f.write("DOMAINS WITH CERTIFICATES EXPIRING SOON:\n")
+    f.write("-" * 80 + "\n")
+    for days, domain, expiry_date_str in sorted(expiring):
+        if days <= 7:
+            f.write(
+                f"⚠️ CRITICAL: {domain} - ONLY {days} DAYS REMAINING (expires on {expiry_date_str}) ⚠️\n"
+            )
+        else:
+            f.write(
+                f"⚠️ WARNING: {domain} - {days} days remaining (expires on {expiry_date_str})\n"
+            )
+    f.write("-" * 80 + "\n\n")
+
+
+# Generate a text report of the domain health check.
+#
+# Results are consumed as a stream: domain entries are written to a buffered
+# temporary file while only the few expiring certificates are kept in memory,
+# then the header, summary and entries are joined into the report file. The
+# report is replaced in one step, so an interrupted run leaves the previous
+# report intact.
+def generate_text_report(
+    results,
+    stats,
+    show_phases=False,
+    mode="full",
+    report_file="domain_health_report.txt",
+):
+    if mode not in REPORT_MODES:
+        raise ValueError(
+            f"Unknown report mode '{mode}', expected one of {REPORT_MODES}"
         )
-        f.write(
-            f"Completely unhealthy domains: {stats['unhealthy']} ({stats['unhealthy']/stats['total']*100:.1f}%)\n\n"
+
+    # Get current time from environment or use system time
+    try:
+        from datetime import datetime
+
+        korean_tz = pytz.timezone("Asia/Seoul")
+        current_time = datetime.now(korean_tz).strftime("%Y-%m-%d %H:%M:%S")
+    except Exception:
+        # Fallback to simple datetime if pytz is not available
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    # Phase bars share one scale so domains can be compared
+    show_phases = show_phases and mode == "full"
+    phase_scale = 0
+    if show_phases:
+        phase_scale = max(
+            (
+                sum(values["mean"] for values in r[key].values())
+                for r in results
+                for key in ("http_phase_stats", "https_phase_stats")
+                if r.get(key)
+            ),
+            default=0,
         )
 
-        # Add section for domains with expiring SSL certificates
-        domains_with_expiring_certs = [
-            r
-            for r in results
-            if r["ssl_valid"] == "OK" and r.get("days_until_expiry", 999) <= 30
-        ]
-        if domains_with_expiring_certs:
-            f.write("DOMAINS WITH CERTIFICATES EXPIRING SOON:\n")
-            f.write("-" * 80 + "\n")
-            for r in sorted(
-                domains_with_expiring_certs, key=lambda x: x.get("days_until_expiry", 0)
-            ):
-                days = r.get("days_until_expiry", 0)
+    report_dir = os.path.dirname(os.path.abspath(report_file))
+    expiring = []
+
+    with tempfile.TemporaryFile(
+        "w+", encoding="utf-8", buffering=BUFFER_SIZE, dir=report_dir
+    ) as entries:
+        for idx, r in enumerate(results, 1):
+            days = r.get("days_until_expiry", 999)
+            if r["ssl_valid"] == "OK" and days <= 30:
                 expiry_date = r.get("ssl_expiry", "Unknown")
                 expiry_date_str = (
                     expiry_date.strftime("%Y-%m-%d")
                     if isinstance(expiry_date, datetime)
                     else "Unknown"
                 )
+                expiring.append((days, r["domain"], expiry_date_str))
 
-                if days <= 7:
-                    f.write(
-                        f"⚠️ CRITICAL: {r['domain']} - ONLY {days} DAYS REMAINING (expires on {expiry_date_str}) ⚠️\n"
-                    )
-                else:
-                    f.write(
-                        f"⚠️ WARNING: {r['domain']} - {days} days remaining (expires on {expiry_date_str})\n"
-                    )
-            f.write("-" * 80 + "\n\n")
+            if mode == "full":
+                write_domain_block(entries, idx, r, show_phases, phase_scale)
+            elif mode == "compact" or not (
+                r["http_status"] == "OK"
+                and r["https_status"] == "OK"
+                and r["ssl_valid"] == "OK"
+            ):
+                entries.write(format_compact_line(idx, r))
 
-        f.write("Detailed results by domain:\n")
-        f.write("=" * 80 + "\n")
+        partial_file = f"{report_file}.partial"
+        with open(partial_file, "w", encoding="utf-8", buffering=BUFFER_SIZE) as f:
+            f.write("Domain Health Check Report\n")
+            f.write("=" * 80 + "\n")
+            f.write(f"Date and Time: {current_time}\n")
+            f.write("=" * 80 + "\n\n")
 
-        for idx, r in enumerate(results, 1):
-            f.write(f"{idx}. {r['domain']}\n")
+            f.write(f"Total domains: {stats['total']}\n")
             f.write(
-                f"   HTTP status: {r['http_status']} (Success rate: {r['http_success_rate']:.0f}%)\n"
+                f"HTTP status OK: {stats['http_ok']} ({stats['http_ok']/stats['total']*100:.1f}%)\n"
             )
             f.write(
-                f"   HTTPS status: {r['https_status']} (Success rate: {r['https_success_rate']:.0f}%)\n"
+                f"HTTPS status OK: {stats['https_ok']} ({stats['https_ok']/stats['total']*100:.1f}%)\n"
             )
             f.write(
-                f"   SSL certificate: {r['ssl_valid']} (Success rate: {r['ssl_success_rate']:.0f}%)\n"
+                f"SSL certificates valid: {stats['ssl_ok']} ({stats['ssl_ok']/stats['total']*100:.1f}%)\n"
+            )
+            f.write(
+                f"Fully healthy domains: {stats['fully_healthy']} ({stats['fully_healthy']/stats['total']*100:.1f}%)\n"
+            )
+            f.write(
+                f"Partially healthy domains: {stats['partially_healthy']} ({stats['partially_healthy']/stats['total']*100:.1f}%)\n"
+            )
+            f.write(
+                f"Completely unhealthy domains: {stats['unhealthy']} ({stats['unhealthy']/stats['total']*100:.1f}%)\n\n"
             )
 
-            # Add response times if available
-            if "avg_http_response_time" in r:
-                f.write(
-                    f"   Average HTTP response time: {r['avg_http_response_time']:.2f} seconds\n"
-                )
-            if "avg_https_response_time" in r:
-                f.write(
-                    f"   Average HTTPS response time: {r['avg_https_response_time']:.2f} seconds\n"
-                )
-
-            if r["ssl_valid"] == "OK" and r.get("ssl_expiry"):
-                expiry_date = r["ssl_expiry"].strftime("%Y-%m-%d")
-                days = r.get("days_until_expiry", "N/A")
+            # Add section for domains with expiring SSL certificates
+            write_expiring_certificates(f, expiring)
 
-                if days != "N/A" and days <= 7:
-                    f.write(
-                        f"   SSL expiry date: {expiry_date} (⚠️ CRITICAL: ONLY {days} DAYS REMAINING! ⚠️)\n"
-                    )
-                elif days != "N/A" and days <= 30:
-                    f.write(
-                        f"   SSL expiry date: {expiry_date} (⚠️ WARNING: ONLY {days} DAYS REMAINING!)\n"
-                    )
-                else:
-                    f.write(f"   SSL expiry date: {expiry_date}\n")
-                    f.write(f"   Days remaining: {days} days\n")
-
-            # Add detailed test results
-            f.write("\n   Individual test results:\n")
-            for test_idx, test in enumerate(r["test_results"], 1):
-                f.write(f"   Test {test_idx}: ")
-                http_status = "✓" if test["http_status"].startswith("OK") else "✗"
-                https_status = "✓" if test["https_status"].startswith("OK") else "✗"
-                ssl_status = "✓" if test["ssl_valid"] == "OK" else "✗"
+            if mode == "failures":
+                f.write("Domains that are not fully healthy:\n")
+            else:
+                f.write("Detailed results by domain:\n")
+            if show_phases:
                 f.write(
-                    f"HTTP: {http_status}, HTTPS: {https_status}, SSL: {ssl_status}\n"
+                    "Phase bars: "
+                    + ", ".join(
+                        f"{symbol}={phase.upper()}"
+                        for phase, symbol in PHASE_SYMBOLS.items()
+                    )
+                    + f" (full bar = {phase_scale:.2f}s)\n"
                 )
+            f.write("=" * 80 + "\n")
+
+            entries.seek(0)
+            shutil.copyfileobj(entries, f, BUFFER_SIZE)
 
-            f.write("-" * 80 + "\n")
+    os.replace(partial_file, report_file)
 
     print(f"Text report saved as '{report_file}'")
     return report_file
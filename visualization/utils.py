@@ -1,4 +1,10 @@
 # visualization/utils.py
+
+# File formats the charts can be saved in; kept here so the setting can be
+# checked without importing the plotting stack
+IMAGE_FORMATS = ("png", "webp", "jpg", "svg", "pdf")
+
+
 def format_percentage(value, total, decimals=1):
     """Format a percentage with the given number of decimal places"""
     if total == 0: